@@ -1,2 +1,4 @@
 from .explicit import explicit_diag_probe
-from .diag import naive_diag
\ No newline at end of file
+from .diag import naive_diag, diag_plus_plus
+from .probing import probing_diag
+from .streaming import DiagEstimator
@@ -1,5 +1,11 @@
 import numpy as np
 
+from ..util.blocks import get_block_size
+from ..util.probes import draw_probes, spawn_rngs
+from ..util.parallel import map_blocks
+from ..util.precision import ACCUMULATION_DTYPE, resolve_dtype
+from ..util.range_finder import randomized_range_finder
+
 from .. import CUPY_INSTALLED
 if CUPY_INSTALLED:
     import cupy as cp
@@ -7,8 +13,23 @@ if CUPY_INSTALLED:
     
     
 
-def naive_diag(A, sample_size=1000):
+def _naive_diag_block(A, n, dtype, use_cupy, block_size, rng):
+    """Returns the contributions of one block of probes (drawn in dtype) to tk and qk, accumulated in float64."""
+
+    xp = cp if use_cupy else np
+    Vk = draw_probes(n, block_size, rng=rng, dtype=dtype, xp=xp)
+
+    return xp.sum((A @ Vk) * Vk, axis=1, dtype=ACCUMULATION_DTYPE), xp.sum(Vk*Vk, axis=1, dtype=ACCUMULATION_DTYPE)
+
+
+
+def naive_diag(A, sample_size=1000, block_size=None, memory_budget=None, seed=None, n_workers=None, executor=None, backend="thread", dtype=None):
     """Naive unbiased estimator for the diagonal of a matrix, see [5]. A must be SPSD.
+
+    Probes are applied in blocks, one matmat with A per block. The block width is block_size if given,
+    otherwise it is picked to fit within memory_budget bytes (see get_block_size). Each block of probes has
+    its own random stream (see spawn_rngs) and blocks may be evaluated in parallel (see map_blocks). Probes and
+    matvecs use the working dtype, see resolve_dtype.
     """
 
     # Get shape
@@ -23,33 +44,83 @@ def naive_diag(A, sample_size=1000):
     else:
         xp = np
 
-    diag_estimate = xp.zeros(n)
-    tk = xp.zeros(n)
-    qk = xp.zeros(n)
+    # Handle blocks
+    dtype = resolve_dtype(A, dtype)
+    block_size = get_block_size(n, sample_size, block_size=block_size, memory_budget=memory_budget, itemsize=dtype.itemsize)
+    n_blocks = int(np.ceil(sample_size/block_size))
+    rngs = spawn_rngs(seed, n_blocks)
+
+    tk = xp.zeros(n, dtype=ACCUMULATION_DTYPE)
+    qk = xp.zeros(n, dtype=ACCUMULATION_DTYPE)
 
-    for j in range(sample_size):
-        
-        # Draw random vector
-        vk = xp.random.choice([-1, 1], size=n)
+    block_args = [ (min(block_size, sample_size - j*block_size), rngs[j]) for j in range(n_blocks) ]
+    for tk_block, qk_block in map_blocks(_naive_diag_block, block_args, n_workers=n_workers, executor=executor, backend=backend, shared_args=(A, n, dtype, xp is not np)):
 
         # Update tk
-        tk = tk + ((A @ vk) * vk)
+        tk += tk_block
 
         # Update qk
-        qk = qk + (vk*vk)
+        qk += qk_block
 
-        # Update diag_estimate
-        diag_estimate = tk / qk
+    diag_estimate = tk / qk
 
     return diag_estimate
 
 
 
+def diag_plus_plus(A, sample_size=300, sketch_size=None, block_size=None, memory_budget=None, seed=None, dtype=None):
+    """Computes the Diag++ estimator of the diagonal of a matrix, see [14]. A must be SPSD.
 
+    With Q an orthonormal basis for the range of A S for a sketch S of sketch_size probes (see
+    randomized_range_finder), diag(A) = diag(QQ^T A) + diag((I - QQ^T) A). The first term is computed exactly
+    from the rows of Q and A Q, and only the second is estimated, with the estimator of naive_diag on the
+    remaining sample_size - 2*sketch_size probes. When A is close to low rank, e.g. A^{-1} for a matrix with a few
+    small eigenvalues, the error decays like 1/sample_size instead of 1/sqrt(sample_size). By default
+    sketch_size = sample_size // 3, as in hutch_plus_plus_trace.
 
+    Blocks of probes are handled as in naive_diag, and the first random stream spawned from seed is used for
+    the sketch.
+    """
 
+    # Get shape
+    n = A.shape[0]
 
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
 
+    if sketch_size is None:
+        sketch_size = sample_size // 3
+    correction_size = sample_size - 2*sketch_size
+    assert correction_size >= 0, "sample_size must be at least 2*sketch_size."
+
+    # Handle blocks
+    dtype = resolve_dtype(A, dtype)
+    block_size = get_block_size(n, max(correction_size, 1), block_size=block_size, memory_budget=memory_budget, itemsize=dtype.itemsize)
+    n_blocks = int(np.ceil(correction_size/block_size))
+    rngs = spawn_rngs(seed, n_blocks + 1)
+
+    # Low-rank part diag(QQ^T A) = rowsum(Q * AQ), A symmetric
+    S = draw_probes(n, sketch_size, rng=rngs[0], dtype=dtype, xp=xp)
+    Q = randomized_range_finder(A, S)
+    diag_estimate = xp.sum(Q * (A @ Q), axis=1, dtype=ACCUMULATION_DTYPE)
+
+    # Estimate of the remainder diag((I - QQ^T) A)
+    tk = xp.zeros(n, dtype=ACCUMULATION_DTYPE)
+    qk = xp.zeros(n, dtype=ACCUMULATION_DTYPE)
+    for j in range(n_blocks):
+        Vk = draw_probes(n, min(block_size, correction_size - j*block_size), rng=rngs[j+1], dtype=dtype, xp=xp)
+        AVk = A @ Vk
+        AVk -= Q @ ( Q.T @ AVk )
+        tk += xp.sum(AVk * Vk, axis=1, dtype=ACCUMULATION_DTYPE)
+        qk += xp.sum(Vk*Vk, axis=1, dtype=ACCUMULATION_DTYPE)
+
+    if correction_size > 0:
+        diag_estimate += tk / qk
 
-
-
+    return diag_estimate
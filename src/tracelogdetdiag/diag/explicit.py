@@ -1,4 +1,7 @@
 import numpy as np
+import scipy.sparse as sp
+
+from ..util.blocks import get_block_size
 
 from .. import CUPY_INSTALLED
 if CUPY_INSTALLED:
@@ -7,10 +10,18 @@ if CUPY_INSTALLED:
     
     
 
-def explicit_diag_probe(A):
-    """Computes the diagonal of A using an explicit probe. Requires exactly n matvecs with A.
+def explicit_diag_probe(A, block_size=None, memory_budget=None):
+    """Computes the diagonal of A using an explicit probe. Requires exactly n matvecs with A, which are done
+    as matmats with blocks of columns of the identity (see get_block_size). If A is a dense or sparse matrix 
+    its diagonal is read off directly.
     """
 
+    # Fast paths for explicit matrices
+    if isinstance(A, np.ndarray):
+        return np.diag(A).copy()
+    elif sp.issparse(A):
+        return A.diagonal()
+
     # Handle CuPy
     if CUPY_INSTALLED:
         if isinstance(A, CuPyLinearOperator):
@@ -24,13 +35,20 @@ def explicit_diag_probe(A):
     n = A.shape[0]
     diagonal = xp.zeros(n)
 
-    for j in range(n):
+    # Handle blocks
+    block_size = get_block_size(n, n, block_size=block_size, memory_budget=memory_budget)
+    n_blocks = int(np.ceil(n/block_size))
+
+    for j in range(n_blocks):
 
-        # jth column of the identity
-        w = xp.zeros(n)
-        w[j] = 1.0
+        # Block of columns of the identity
+        start, stop = j*block_size, min((j+1)*block_size, n)
+        idx = xp.arange(stop-start)
+        E = xp.zeros((n, stop-start))
+        E[start+idx, idx] = 1.0
 
-        # Compute w^T A w
-        diagonal[j] = w.T @ (A @ w)
+        # Read off the diagonal of the block
+        AE = A @ E
+        diagonal[start:stop] = AE[start+idx, idx]
 
     return diagonal
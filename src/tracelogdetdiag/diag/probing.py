@@ -0,0 +1,85 @@
+import numpy as np
+import scipy.sparse as sp
+
+from ..util.blocks import get_block_size
+from ..util.probing import greedy_coloring, coloring_probes, hadamard_probes
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+
+def probing_diag(A, pattern=None, distance=1, method="coloring", sample_size=None, block_size=None, memory_budget=None):
+    """Estimates the diagonal of A using structured (deterministic) probing vectors.
+
+    method="coloring" colors the graph of the sparsity pattern of A (or of pattern, which must be given if A
+    is not an explicit dense or sparse matrix) raised to the given distance, and probes with one indicator vector
+    per color. If the pattern of A is contained in the colored pattern the diagonal is recovered exactly, using
+    as many matvecs as colors (about the bandwidth for banded A).
+
+    method="hadamard" uses the estimator of [5] with the first sample_size columns of a Hadamard matrix as probes.
+
+    Probes are applied in blocks, see get_block_size.
+    """
+
+    valid_methods = ["coloring", "hadamard"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    # Get shape
+    n = A.shape[0]
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    if method == "coloring":
+
+        if pattern is None:
+            assert sp.issparse(A) or isinstance(A, np.ndarray), "pattern must be given if A is not an explicit matrix."
+            pattern = A
+        colors = greedy_coloring(pattern, distance=distance)
+        n_colors = np.max(colors) + 1
+
+        # Handle blocks
+        block_size = get_block_size(n, n_colors, block_size=block_size, memory_budget=memory_budget)
+        n_blocks = int(np.ceil(n_colors/block_size))
+
+        diagonal = xp.zeros(n)
+        for j in range(n_blocks):
+
+            # Probe with a block of colors
+            start, stop = j*block_size, min((j+1)*block_size, n_colors)
+            V = xp.asarray(coloring_probes(colors, start=start, stop=stop))
+            AV = A @ V
+
+            # Each row only reads off the column of its own color
+            rows = np.flatnonzero((colors >= start) & (colors < stop))
+            diagonal[rows] = AV[rows, colors[rows]-start]
+
+    elif method == "hadamard":
+
+        assert sample_size is not None, "sample_size must be given for method='hadamard'."
+
+        # Handle blocks
+        block_size = get_block_size(n, sample_size, block_size=block_size, memory_budget=memory_budget)
+        n_blocks = int(np.ceil(sample_size/block_size))
+
+        tk = xp.zeros(n)
+        for j in range(n_blocks):
+            curr_block_size = min(block_size, sample_size - j*block_size)
+            V = xp.asarray(hadamard_probes(n, curr_block_size, start=j*block_size))
+            tk += xp.sum((A @ V) * V, axis=1)
+
+        diagonal = tk/sample_size
+
+    else:
+        raise NotImplementedError
+
+    return diagonal
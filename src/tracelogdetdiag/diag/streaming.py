@@ -0,0 +1,105 @@
+import numpy as np
+
+from .diag import _naive_diag_block
+from ..util.probes import get_seed_sequence, seed_sequence_state, seed_sequence_from_state
+from ..util.precision import ACCUMULATION_DTYPE, resolve_dtype
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+
+class DiagEstimator:
+    """Estimator of diag(A) (see naive_diag and [5]) that can be updated with more probes and merged with other
+    estimators. A must be SPSD.
+
+    The sufficient statistics are the accumulators tk = sum_k v_k * A v_k and qk = sum_k v_k * v_k of
+    naive_diag, kept in float64, so update(n_probes) can be called until result() is accurate enough, and
+    estimators of the same A can be combined with merge. As for HutchinsonTraceEstimator, each block is drawn from
+    a new stream spawned from seed, estimators to be merged must use different seeds, and state_dict and
+    from_state_dict save and restore the accumulators with the position in the random stream.
+    """
+
+    def __init__(self, A, block_size=20, seed=None, dtype=None):
+
+        # Bind
+        self.A = A
+        self.n = A.shape[0]
+        self.block_size = block_size
+        self.dtype = resolve_dtype(A, dtype)
+        self.sample_size = 0
+        self._seed_seq = get_seed_sequence(seed)
+
+        # Handle CuPy
+        if CUPY_INSTALLED:
+            if isinstance(A, CuPyLinearOperator):
+                self.xp = cp
+            else:
+                self.xp = np
+        else:
+            self.xp = np
+
+        self.tk = self.xp.zeros(self.n, dtype=ACCUMULATION_DTYPE)
+        self.qk = self.xp.zeros(self.n, dtype=ACCUMULATION_DTYPE)
+
+    def update(self, n_probes):
+        """Draws n_probes more probes, in blocks of (at most) block_size, and adds them to tk and qk."""
+
+        for start in range(0, n_probes, self.block_size):
+            curr_block_size = min(self.block_size, n_probes - start)
+            rng = np.random.default_rng(self._seed_seq.spawn(1)[0])
+            tk_block, qk_block = _naive_diag_block(self.A, self.n, self.dtype, self.xp is not np, curr_block_size, rng)
+            self.tk += tk_block
+            self.qk += qk_block
+            self.sample_size += curr_block_size
+
+        return self
+
+    def merge(self, other):
+        """Adds the probes of the estimator other (of the same A, drawn with a different seed) to self."""
+
+        assert other.n == self.n, "Estimators must be of operators of the same shape."
+        assert (other._seed_seq.entropy, other._seed_seq.spawn_key) != (self._seed_seq.entropy, self._seed_seq.spawn_key), "Estimators with the same seed draw the same probes and cannot be merged."
+        self.tk += self.xp.asarray(other.tk)
+        self.qk += self.xp.asarray(other.qk)
+        self.sample_size += other.sample_size
+
+        return self
+
+    def result(self):
+        """Returns the estimate tk/qk of diag(A)."""
+
+        return self.tk / self.qk
+
+    def state_dict(self):
+        """Returns the accumulators and random stream state as a dict of plain Python types."""
+
+        tk, qk = self.tk, self.qk
+        if self.xp != np:
+            tk, qk = cp.asnumpy(tk), cp.asnumpy(qk)
+
+        state = {
+            "n": self.n,
+            "block_size": self.block_size,
+            "dtype": np.dtype(self.dtype).name,
+            "sample_size": self.sample_size,
+            "tk": tk.tolist(),
+            "qk": qk.tolist(),
+            "seed_sequence": seed_sequence_state(self._seed_seq),
+        }
+
+        return state
+
+    @classmethod
+    def from_state_dict(cls, A, state):
+        """Restores an estimator of A from the output of state_dict. Further updates continue its random stream."""
+
+        assert A.shape[0] == state["n"], "A does not match the saved estimator."
+        estimator = cls(A, block_size=state["block_size"], seed=seed_sequence_from_state(state["seed_sequence"]), dtype=np.dtype(state["dtype"]))
+        estimator.tk += estimator.xp.asarray(state["tk"], dtype=ACCUMULATION_DTYPE)
+        estimator.qk += estimator.xp.asarray(state["qk"], dtype=ACCUMULATION_DTYPE)
+        estimator.sample_size = state["sample_size"]
+
+        return estimator
@@ -1,2 +1,4 @@
 from .diaginv import naive_diaginv
-from .explicit import explicit_diaginv_probe
\ No newline at end of file
+from .explicit import explicit_diaginv_probe, diaginv_via_selected_inversion
+from .probing import probing_diaginv
+from .lowrank import lowrank_diaginv
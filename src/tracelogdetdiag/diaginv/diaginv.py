@@ -1,50 +1,63 @@
 import numpy as np
-from scipy.linalg import cho_factor as scipy_chol_fac
-from scipy.linalg import cho_solve as scipy_chol_solve
 
+from ..util.blocks import get_block_size
+from ..util.cholesky import CHOLESKY_BACKENDS
+from ..util.factorization import factorize
+from ..util.probes import draw_probes, spawn_rngs
+from ..util.parallel import map_blocks
 
 
-def naive_diaginv(A, sample_size=1000, method="cholesky"):
+
+def _naive_diaginv_block(solve_fn, chol, n, block_size, rng):
+    """Returns the contributions of one block of probes to tk and qk."""
+
+    Vk = draw_probes(n, block_size, rng=rng)
+    Ainv_Vk = solve_fn(chol, Vk)
+
+    return np.sum(Ainv_Vk * Vk, axis=1), np.sum(Vk*Vk, axis=1)
+
+
+
+def naive_diaginv(A, sample_size=1000, method="cholesky", block_size=None, memory_budget=None, seed=None, n_workers=None, executor=None, backend="thread", factorization=None, key=None):
     """Naive unbiased estimator for the diagonal of an inverse matrix, see [5]. A must be SPD.
+
+    Probes are solved for in blocks, one multiple right-hand side solve per block. The block width is
+    block_size if given, otherwise it is picked to fit within memory_budget bytes (see get_block_size). Each block
+    of probes has its own random stream (see spawn_rngs) and blocks may be solved for in parallel (see map_blocks).
+
+    A is factored once with method, one of "cholesky" (dense), "banded_cholesky" or "sparse_cholesky", see
+    CHOLESKY_BACKENDS. A Factorization may be passed explicitly, otherwise one is computed (and cached if key is
+    given, see factorize). The sparse factorization cannot be shared with a process pool.
     """
 
-    valid_methods = ["cholesky"]
+    valid_methods = list(CHOLESKY_BACKENDS.keys())
     assert method in valid_methods, f"method must be one of {valid_methods}"
 
     # Get shape
     n = A.shape[0]
 
+    # Handle blocks
+    block_size = get_block_size(n, sample_size, block_size=block_size, memory_budget=memory_budget)
+    n_blocks = int(np.ceil(sample_size/block_size))
+    rngs = spawn_rngs(seed, n_blocks)
+
     # Setup
-    diaginv_estimate = np.zeros(n)
     tk = np.zeros(n)
     qk = np.zeros(n)
 
-    if method == "cholesky":
-        chol = scipy_chol_fac(A)
-    else:
-        raise NotImplementedError
+    if factorization is None:
+        factorization = factorize(A, method=method, key=key)
+    solve_fn = CHOLESKY_BACKENDS[factorization.method][1]
 
-    for j in range(sample_size):
-        
-        # Draw random vector
-        vk = np.random.choice([-1, 1], size=n)
+    block_args = [ (min(block_size, sample_size - j*block_size), rngs[j]) for j in range(n_blocks) ]
+    for tk_block, qk_block in map_blocks(_naive_diaginv_block, block_args, n_workers=n_workers, executor=executor, backend=backend, shared_args=(solve_fn, factorization.factor, n)):
 
         # Update tk
-        if method == "cholesky":
-            Ainv_vk = scipy_chol_solve(chol, vk)
-        else:
-            raise NotImplementedError
-    
-        tk = tk + (( Ainv_vk ) * vk)
+        tk += tk_block
 
         # Update qk
-        qk = qk + (vk*vk)
+        qk += qk_block
 
-        # Update diag_estimate
-        diaginv_estimate = tk / qk
+    diaginv_estimate = tk / qk
 
     return diaginv_estimate
-
-
-
-
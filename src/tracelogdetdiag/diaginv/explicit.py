@@ -1,37 +1,65 @@
 import numpy as np
-from scipy.linalg import cho_factor as scipy_chol_fac
-from scipy.linalg import cho_solve as scipy_chol_solve
 
+from ..util.blocks import get_block_size
+from ..util.cholesky import CHOLESKY_BACKENDS
+from ..util.factorization import factorize
 
 
-def explicit_diaginv_probe(A, method="cholesky"):
+
+def explicit_diaginv_probe(A, method="cholesky", block_size=None, memory_budget=None, factorization=None, key=None):
     """Computes the diagonal of inv(A) using an explicit probe. A must be SPD.
+
+    A is factored once, and then solved against blocks of columns of the identity with one multiple right-hand 
+    side solve per block (see get_block_size). method is one of "cholesky" (dense), "banded_cholesky" or
+    "sparse_cholesky", see CHOLESKY_BACKENDS. For banded or sparse A, diaginv_via_selected_inversion avoids the
+    n solves altogether. A Factorization may be passed explicitly, otherwise one is computed
+    (and cached if key is given, see factorize).
     """
 
-    valid_methods = ["cholesky"]
+    valid_methods = list(CHOLESKY_BACKENDS.keys())
     assert method in valid_methods, f"method must be one of {valid_methods}"
 
     # Setup
     n = A.shape[0]
     diagonal_inv = np.zeros(n)
 
-    if method == "cholesky":
-        chol = scipy_chol_fac(A)
-    else:
-        raise NotImplementedError
+    if factorization is None:
+        factorization = factorize(A, method=method, key=key)
+
+    # Handle blocks
+    block_size = get_block_size(n, n, block_size=block_size, memory_budget=memory_budget)
+    n_blocks = int(np.ceil(n/block_size))
 
-    for j in range(n):
+    for j in range(n_blocks):
 
-        # jth column of the identity
-        w = np.zeros(n)
-        w[j] = 1.0
+        # Block of columns of the identity
+        start, stop = j*block_size, min((j+1)*block_size, n)
+        idx = np.arange(stop-start)
+        E = np.zeros((n, stop-start))
+        E[start+idx, idx] = 1.0
 
-        # Compute w^T inv(A) w
-        if method == "cholesky":
-            Ainv_w = scipy_chol_solve(chol, w)
-        else:
-            raise NotImplementedError
+        # Read off the diagonal of inv(A) for the block
+        Ainv_E = factorization.solve(E)
 
-        diagonal_inv[j] = w.T @ Ainv_w
+        diagonal_inv[start:stop] = Ainv_E[start+idx, idx]
 
     return diagonal_inv
+
+
+
+def diaginv_via_selected_inversion(A, method="banded_cholesky", bandwidth=None, factorization=None, key=None):
+    """Computes the diagonal of inv(A) exactly from a banded or sparse Cholesky factorization of A with the Takahashi
+    recurrences (selected inversion), see banded_selected_inversion and sparse_selected_inversion. A must be SPD.
+
+    With method="banded_cholesky" this costs O(n b^2) for bandwidth b (detected from A if not given), with
+    method="sparse_cholesky" it is proportional to the fill of the factorization. A Factorization may be
+    passed explicitly, otherwise one is computed (and cached if key is given, see factorize).
+    """
+
+    valid_methods = ["banded_cholesky", "sparse_cholesky"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    if factorization is None:
+        factorization = factorize(A, method=method, bandwidth=bandwidth, key=key)
+
+    return factorization.diaginv()
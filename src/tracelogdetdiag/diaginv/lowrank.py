@@ -0,0 +1,19 @@
+from ..diag.diag import diag_plus_plus
+from ..traceinv.traceinv import get_Ainv_operator
+
+
+
+def lowrank_diaginv(A, sample_size=300, sketch_size=None, solver="cg", cg_tol=1e-4, cg_maxits=1000, M=None, block_size=None, memory_budget=None, seed=None, recycle_k=0):
+    """Estimates the diagonal of inv(A) with Diag++ (see diag_plus_plus and [14]), i.e., from a randomized
+    low-rank approximation QQ^T A^{-1} whose diagonal is computed exactly, plus a stochastic correction for
+    diag((I - QQ^T) A^{-1}). A must be SPD.
+
+    Only solves with A are needed, so with solver="cg" (and a preconditioner M, e.g. incomplete_cholesky_preconditioner)
+    this works for large sparse A that cannot be factored. The range of A^{-1} is dominated by the eigenvectors
+    for the smallest eigenvalues of A, which are also the ones that slow down CG, so recycle_k > 0 (deflated CG
+    with vectors harvested from earlier solves) pays off twice here. See get_Ainv_operator for the solver options.
+    """
+
+    Ainv = get_Ainv_operator(A, solver=solver, cg_tol=cg_tol, cg_maxits=cg_maxits, M=M, recycle_k=recycle_k)
+
+    return diag_plus_plus(Ainv, sample_size=sample_size, sketch_size=sketch_size, block_size=block_size, memory_budget=memory_budget, seed=seed)
@@ -0,0 +1,19 @@
+from ..diag.probing import probing_diag
+from ..traceinv.traceinv import get_Ainv_operator
+
+
+
+def probing_diaginv(A, pattern=None, distance=2, solver="cg", cg_tol=1e-4, cg_maxits=1000, M=None, block_size=None, memory_budget=None, recycle_k=0):
+    """Estimates the diagonal of inv(A) by probing A^{-1} with the coloring of the graph of the sparsity pattern 
+    of A (or of pattern) raised to the given distance, see probing_diag and [13]. A must be SPD.
+
+    Since inv(A) is generally dense this is not exact, but for matrices whose inverse decays away from the
+    sparsity pattern (e.g., banded precision matrices) the error decreases quickly with distance. 
+    See get_Ainv_operator for the solver options.
+    """
+
+    if pattern is None:
+        pattern = A
+    Ainv = get_Ainv_operator(A, solver=solver, cg_tol=cg_tol, cg_maxits=cg_maxits, M=M, recycle_k=recycle_k)
+
+    return probing_diag(Ainv, pattern=pattern, distance=distance, method="coloring", block_size=block_size, memory_budget=memory_budget)
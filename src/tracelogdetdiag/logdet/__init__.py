@@ -1,3 +1,5 @@
 from .explicit import logdet_via_cholesky
-from .util import evaluate_ith_chebyshev_polynomial, get_chebyshev_coeff
-from .stochastic_chebyshev import logdet_stochastic_chebyshev_approx, logdet_stochastic_chebyshev_epsilon_delta_approx
\ No newline at end of file
+from .util import evaluate_ith_chebyshev_polynomial, get_chebyshev_coeff, get_chebyshev_coeffs, get_logdet_chebyshev_coeffs, get_interval_chebyshev_coeffs, chebyshev_damping_factors
+from .stochastic_chebyshev import logdet_stochastic_chebyshev_approx, logdet_stochastic_chebyshev_epsilon_delta_approx, trace_fun_stochastic_chebyshev_approx
+from .stochastic_lanczos import trace_fun_stochastic_lanczos_quadrature, logdet_stochastic_lanczos_quadrature
+from .deflated import trace_fun_hutch_plus_plus, logdet_hutch_plus_plus
@@ -0,0 +1,108 @@
+import numpy as np
+
+from .util import get_interval_chebyshev_coeffs
+from .stochastic_chebyshev import _get_spectral_bounds
+from .stochastic_lanczos import SPECTRAL_FUNCTIONS
+from ..util.chebyshev import chebyshev_moments_block
+from ..util.lanczos import batched_lanczos
+from ..util.probes import draw_probes, spawn_rngs
+from ..util.precision import resolve_dtype
+from ..util.range_finder import randomized_range_finder
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+
+def trace_fun_hutch_plus_plus(A, f, sample_size=30, sketch_size=None, estimator="chebyshev", sigma_min=None, sigma_max=None, chebyshev_n=14, lanczos_n=50, tol=1e-6, block_size=20, bounds_method="lanczos", bounds_key=None, method="rademacher", seed=None, dtype=None, damping=None):
+    """Computes a Hutch++ estimate of tr(f(A)) for a symmetric matrix A, see [9]. f is a vectorized function of
+    the eigenvalues or one of the keys of SPECTRAL_FUNCTIONS.
+
+    With Q an orthonormal basis for the range of A S for a sketch S of sketch_size probes (see
+    randomized_range_finder), tr(f(A)) = tr(Q^T f(A) Q) + tr((I - QQ^T) f(A) (I - QQ^T)). The first term is
+    computed by pushing the columns of Q through the approximation of f(A), and only the second term is estimated
+    with the sample_size - 2*sketch_size projected probes (I - QQ^T) g. If the spectrum of A decays quickly, most
+    of the variance of tr(f(A)) is in the top subspace, and the error decays like 1/sample_size instead of
+    1/sqrt(sample_size). By default sketch_size = sample_size // 3, as in hutch_plus_plus_trace.
+
+    f(A) is approximated with estimator = "chebyshev" (a Chebyshev expansion of degree chebyshev_n on
+    [sigma_min, sigma_max], see trace_fun_stochastic_chebyshev_approx for the caveats of estimated bounds and
+    bounds_key) or "lanczos" (Lanczos quadrature with at
+    most lanczos_n steps, see trace_fun_stochastic_lanczos_quadrature). Each vector of Q and each probe costs
+    chebyshev_n (or up to lanczos_n) matvecs with A, processed in blocks of (at most) block_size vectors.
+    """
+
+    # Get shape
+    n = A.shape[0]
+
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    valid_estimators = ["chebyshev", "lanczos"]
+    assert estimator in valid_estimators, f"estimator must be one of {valid_estimators}"
+
+    if isinstance(f, str):
+        assert f in SPECTRAL_FUNCTIONS.keys(), f"f must be a callable or one of {list(SPECTRAL_FUNCTIONS.keys())}"
+        f = SPECTRAL_FUNCTIONS[f]
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    if sketch_size is None:
+        sketch_size = sample_size // 3
+    hutchinson_size = sample_size - 2*sketch_size
+    assert hutchinson_size >= 0, "sample_size must be at least 2*sketch_size."
+
+    # Handle blocks, the first stream is used for the sketch
+    n_blocks = int(np.ceil(hutchinson_size/block_size))
+    rngs = spawn_rngs(seed, n_blocks + 1)
+    dtype = resolve_dtype(A, dtype)
+
+    # Range approximation of A
+    S = draw_probes(n, sketch_size, method=method, rng=rngs[0], dtype=dtype, xp=xp)
+    Q = randomized_range_finder(A, S)
+
+    # Sum of v^T f(A) v over the columns v of a block
+    if estimator == "chebyshev":
+        sigma_min, sigma_max = _get_spectral_bounds(A, sigma_min, sigma_max, bounds_method, seed=seed, key=bounds_key)
+        chebyshev_coeffs = get_interval_chebyshev_coeffs(f, sigma_min, sigma_max, chebyshev_n, damping=damping)
+        block_fn = lambda V: float(chebyshev_coeffs @ chebyshev_moments_block(A, V, sigma_min, sigma_max, chebyshev_n))
+    else:
+        block_fn = lambda V: float(np.sum(batched_lanczos(A, V, maxits=lanczos_n, f=f, tol=tol)["quadrature_estimates"]))
+
+    # Top subspace, tr(Q^T f(A) Q)
+    trace_estimate = 0.0
+    for start in range(0, Q.shape[1], block_size):
+        trace_estimate += block_fn(Q[:,start:start+block_size])
+
+    # Hutchinson estimate of the remainder with projected probes
+    remainder = 0.0
+    for j in range(n_blocks):
+        curr_block_size = min(block_size, hutchinson_size - j*block_size)
+        G = draw_probes(n, curr_block_size, method=method, rng=rngs[j+1], dtype=dtype, xp=xp)
+        G -= Q @ ( Q.T @ G )
+        remainder += block_fn(G)
+
+    if hutchinson_size > 0:
+        trace_estimate += remainder/hutchinson_size
+
+    return trace_estimate
+
+
+
+def logdet_hutch_plus_plus(C, sample_size=30, sketch_size=None, estimator="chebyshev", sigma_min=None, sigma_max=None, chebyshev_n=14, lanczos_n=50, tol=1e-6, block_size=20, bounds_method="lanczos", bounds_key=None, method="rademacher", seed=None, dtype=None, damping=None):
+    """Computes a Hutch++ estimate of logdet(C) = tr(log(C)) for a SPD matrix C, deflating the top subspace of C
+    found with a randomized range finder and estimating only the remainder stochastically, see
+    trace_fun_hutch_plus_plus. For the same number of probes this has a much smaller variance than
+    logdet_stochastic_chebyshev_approx or logdet_stochastic_lanczos_quadrature when the spectrum of C decays quickly.
+    """
+
+    return trace_fun_hutch_plus_plus(C, np.log, sample_size=sample_size, sketch_size=sketch_size, estimator=estimator, sigma_min=sigma_min, sigma_max=sigma_max, chebyshev_n=chebyshev_n, lanczos_n=lanczos_n, tol=tol, block_size=block_size, bounds_method=bounds_method, bounds_key=bounds_key, method=method, seed=seed, dtype=dtype, damping=damping)
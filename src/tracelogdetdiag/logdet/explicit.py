@@ -1,13 +1,26 @@
-import numpy as np
+from ..util.cholesky import CHOLESKY_BACKENDS
+from ..util.factorization import factorize
 
 
 
-def logdet_via_cholesky(A, banded_cholesky=False):
-    """Computes logdet(A) using the Cholesky method. A must be SPD."""
+def logdet_via_cholesky(A, banded_cholesky=False, method=None, bandwidth=None, factorization=None, key=None):
+    """Computes logdet(A) using the Cholesky method. A must be SPD.
 
-    if not banded_cholesky:
-        chol = np.linalg.cholesky(A)
-    else:
-        raise NotImplementedError
+    method is one of "cholesky" (dense), "banded_cholesky" (A in banded form, O(n b^2) for bandwidth b, which is
+    detected from A if not given) or "sparse_cholesky" (sparse LDL^T with a fill-reducing ordering). By default
+    method is "banded_cholesky" if banded_cholesky=True and "cholesky" otherwise.
 
-    return 2*np.sum(np.log(np.diag(chol)))
+    A Factorization may be passed explicitly to share it with e.g. naive_diaginv on the same A. Otherwise A is
+    factored, and the factorization is cached if a key (identifying the current values of A) is given, see factorize.
+    """
+
+    if method is None:
+        method = "banded_cholesky" if banded_cholesky else "cholesky"
+
+    valid_methods = list(CHOLESKY_BACKENDS.keys())
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    if factorization is None:
+        factorization = factorize(A, method=method, bandwidth=bandwidth, key=key)
+
+    return factorization.logdet()
@@ -1,112 +1,128 @@
 import numpy as np
-from scipy.sparse.linalg import eigs as scipy_eigs
 
-from .util import get_chebyshev_coeff
+from .util import get_interval_chebyshev_coeffs, get_logdet_chebyshev_coeffs
+from .stochastic_lanczos import SPECTRAL_FUNCTIONS
+from ..util.spectral_bounds import spectral_bounds, widen_spectral_bounds
+from ..util.chebyshev import stochastic_chebyshev_moments
 
-from .. import CUPY_INSTALLED
-if CUPY_INSTALLED:
-    import cupy as cp
-    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
 
 
-def logdet_stochastic_chebyshev_approx(C, sigma_max=None, sigma_min=None, sample_size=100, chebyshev_n=14):
+def _get_spectral_bounds(A, sigma_min, sigma_max, bounds_method, seed=None, key=None):
+    """Fills in the bounds on the spectrum of A that are not given with estimates from spectral_bounds (cached if
+    a key is given), and widens a degenerate interval, see widen_spectral_bounds."""
+
+    if (sigma_max is None) or (sigma_min is None):
+        lower, upper = spectral_bounds(A, method=bounds_method, key=key, seed=seed)
+        if sigma_max is None:
+            sigma_max = upper
+        if sigma_min is None:
+            sigma_min = lower
+
+    sigma_min, sigma_max = widen_spectral_bounds(float(sigma_min), float(sigma_max))
+
+    return sigma_min, sigma_max
+
+
+
+def trace_fun_stochastic_chebyshev_approx(A, f, sigma_min=None, sigma_max=None, sample_size=100, chebyshev_n=14, block_size=20, bounds_method="lanczos", bounds_key=None, method="rademacher", seed=None, n_workers=None, executor=None, backend="thread", dtype=None, damping=None):
+    """Computes an approximation to tr(f(A)) for a symmetric matrix A with eigenvalues in [sigma_min, sigma_max],
+    using a stochastic Chebyshev expansion of f of degree chebyshev_n, see [7]. f is a vectorized function of the
+    eigenvalues or one of the keys of SPECTRAL_FUNCTIONS, e.g. "log" (logdet), "inv" (tr(A^{-1})) or "exp"
+    (Estrada index), or lambda x: x**p for tr(A^p). If either bound is not given, it is estimated with
+    spectral_bounds(A, method=bounds_method). With the default bounds_method="lanczos" the estimated sigma_min
+    may lie above the smallest eigenvalues of an ill-conditioned A (see lanczos_spectral_bounds), and the expansion
+    then converges to a wrong value as chebyshev_n grows; pass sigma_min (or use bounds_method="gershgorin") when
+    a guaranteed lower bound is needed. If bounds_key is given, the estimated bounds are cached for A under that
+    key, see spectral_bounds.
+
+    f may also be a list of such functions, in which case a list of estimates is returned. All of them are
+    computed from the same Chebyshev moments (see stochastic_chebyshev_moments), i.e., from the same
+    chebyshev_n matmats per block of probes, so e.g. logdet(A) and tr(A^{-1}) can be had for the price of one.
+    The expansions may be damped, see chebyshev_damping_factors.
+    """
+
+    fs = f if isinstance(f, (list, tuple)) else [f]
+    for fi in fs:
+        if isinstance(fi, str):
+            assert fi in SPECTRAL_FUNCTIONS.keys(), f"f must be a callable or one of {list(SPECTRAL_FUNCTIONS.keys())}"
+    fs = [ SPECTRAL_FUNCTIONS[fi] if isinstance(fi, str) else fi for fi in fs ]
+
+    sigma_min, sigma_max = _get_spectral_bounds(A, sigma_min, sigma_max, bounds_method, seed=seed, key=bounds_key)
+    moments = stochastic_chebyshev_moments(A, sigma_min, sigma_max, chebyshev_n, sample_size=sample_size, block_size=block_size, method=method, seed=seed, n_workers=n_workers, executor=executor, backend=backend, dtype=dtype)
+
+    # (Cached) Chebyshev coefficients of each f on [sigma_min, sigma_max]
+    estimates = []
+    for fi in fs:
+        estimates.append(float(get_interval_chebyshev_coeffs(fi, sigma_min, sigma_max, chebyshev_n, damping=damping) @ moments))
+
+    if isinstance(f, (list, tuple)):
+        return estimates
+    else:
+        return estimates[0]
+
+
+
+def logdet_stochastic_chebyshev_approx(C, sigma_max=None, sigma_min=None, sample_size=100, chebyshev_n=14, block_size=20, bounds_method="lanczos", bounds_key=None, seed=None, n_workers=None, executor=None, backend="thread", dtype=None, damping=None):
     """Computes an approximation to logdet(C) for a SPSD matrix C, using the 
     stochastic Chebyshev approximation detailed in [7]. Eigenvalues of C are assumed to lie in
-    the interval [sigma_min, sigma_max].
+    the interval [sigma_min, sigma_max]. If either bound is not given, it is estimated with
+    spectral_bounds(C, method=bounds_method). As for trace_fun_stochastic_chebyshev_approx, the estimated sigma_min
+    is not guaranteed to be below the spectrum of C, in which case the estimate is biased; pass sigma_min if a
+    lower bound on the eigenvalues of C is known. bounds_key caches the estimated bounds, see spectral_bounds.
+
+    The probes are pushed through the Chebyshev recurrence in blocks of (at most) block_size
+    vectors, so each degree of the expansion costs one matmat with C per block rather than one
+    matvec per probe, see stochastic_chebyshev_moments. Exactly sample_size probes are used, each block
+    with its own random stream (see spawn_rngs). Blocks may be evaluated in parallel, see map_blocks. The
+    Chebyshev recurrence uses the working dtype, see resolve_dtype.
+
+    The Chebyshev coefficients are computed at once with a DCT and cached per (delta, chebyshev_n, damping), see
+    get_logdet_chebyshev_coeffs. damping="jackson" or "lanczos" damps the expansion (see chebyshev_damping_factors),
+    which suppresses the oscillations of a low-degree expansion that does not yet resolve log near sigma_min (large
+    condition numbers), at the price of a slower convergence in chebyshev_n for well-conditioned C.
 
     Modified from author code here: https://alinlab.kaist.ac.kr/publications.html.
     """
 
     # Get dimension
     d = C.shape[0]
-    
-    # Handle CuPy
-    if CUPY_INSTALLED:
-        if isinstance(C, CuPyLinearOperator):
-            xp = cp
-        else:
-            xp = np
-    else:
-        xp = np
-    
-    if (sigma_max is None) and (sigma_min is None):
-
-        # Get largest and smallest singular values
-        if xp == np:
-            sigma_max, _ = scipy_eigs(C, k=1, which="LM")
-            sigma_min, _ = scipy_eigs(C, k=1, which="SM")
-            sigma_max, sigma_min = np.real(sigma_max[0]), np.real(sigma_min[0])
-        else:
-            sigma_max, _ = cupy_eigsh(C, k=1, which="LM")
-            sigma_min, _ = cupy_eigsh(C, k=1, which="SA")
-            sigma_max, sigma_min = cp.real(sigma_max[0]), cp.real(sigma_min[0])
-            sigma_max, sigma_min = cp.asnumpy(sigma_max), cp.asnumpy(sigma_min) 
+
+    # Get bounds on the spectrum
+    sigma_min, sigma_max = _get_spectral_bounds(C, sigma_min, sigma_max, bounds_method, seed=seed, key=bounds_key)
 
     # Scaling
     a = sigma_min + sigma_max
     delta = sigma_min/a
 
-    # Make B
-    B = (1/a)*C
-    logdet_estimate = 0.0
-
-    # Funcs
-    f = lambda x: np.log(1-x)
-    g = lambda x: ((1-2*delta)/2)*x + 0.5
-    ginv = lambda x: (2/(1-2*delta))*x
-    h = lambda x: f(g(x))
-
-    # Get Chebyshev coeffs
-    chebyshev_coeffs = [ get_chebyshev_coeff(h, chebyshev_n, i) for i in range(0, chebyshev_n+1) ]
+    # Get (cached) Chebyshev coeffs of log(1 - g(x)), g(x) = ((1-2*delta)/2)*x + 0.5, where x = -A' for C/a = 1 - g(x)
+    # and A' = (2C - a I)/(sigma_max - sigma_min) as in stochastic_chebyshev_moments, hence the alternating signs
+    chebyshev_coeffs = get_logdet_chebyshev_coeffs(delta, chebyshev_n, damping=damping)
+    chebyshev_coeffs[1::2] *= -1
 
     # Random sampling
-    for j in range(sample_size):
-        
-        # Draw random vector
-        v = xp.random.choice([-1, 1], size=d)
-        u = chebyshev_coeffs[0]*v
-
-        if chebyshev_n > 1:
-            w0 = v
-            w1 = B @ v
-            w1 = ginv(w1)
-            w1 = v/(1 - 2*delta) - w1
-            u = chebyshev_coeffs[1]*w1 + chebyshev_coeffs[0]*w0
-
-            for k in range(2, chebyshev_n+1):
-
-                w2 = B @ w1
-                w2 = ginv(w2)
-                w2 = w1/(1 - 2*delta) - w2
-                w2 = 2*w2 - w0
-                u = chebyshev_coeffs[k]*w2 + u
-                w0 = w1
-                w1 = w2
-        
-        logdet_estimate += (xp.dot(v, u))/sample_size
-
-    logdet_estimate += d*xp.log(a)
+    moments = stochastic_chebyshev_moments(C, sigma_min, sigma_max, chebyshev_n, sample_size=sample_size, block_size=block_size, seed=seed, n_workers=n_workers, executor=executor, backend=backend, dtype=dtype)
+    logdet_estimate = chebyshev_coeffs @ moments
+
+    logdet_estimate += d*np.log(a)
 
     return logdet_estimate
 
 
 
-def logdet_stochastic_chebyshev_epsilon_delta_approx(C, epsilon=0.1, zeta=0.1, sample_size=None, details=False):
+def logdet_stochastic_chebyshev_epsilon_delta_approx(C, epsilon=0.1, zeta=0.1, sample_size=None, details=False, block_size=20, bounds_method="lanczos", bounds_key=None, seed=None, n_workers=None, executor=None, backend="thread", dtype=None, damping=None):
     """Computes an approximation to logdet(C) for a SPD matrix C, using the 
     stochastic Chebyshev approximation detailed in [7]. Returns an estimate
     \hat{logdet}(C) s.t. |logdet(C) - \hat{logdet}(C)| < epsilon*|logdet(C)| 
     with at least probaility 1-zeta. 
 
     If you override sample_size (which you might do since the bound is loose), you
-    no longer have the same guarantee.
+    no longer have the same guarantee. bounds_key caches the estimated bounds, see spectral_bounds.
 
     Modified from author code here: https://alinlab.kaist.ac.kr/publications.html.
     """
 
-    # Get largest and smallest singular values
-    sigma_max, _ = scipy_eigs(C, k=1, which="LM")
-    sigma_min, _ = scipy_eigs(C, k=1, which="SM")
-    sigma_max, sigma_min = np.real(sigma_max[0]), np.real(sigma_min[0])
+    # Get bounds on the spectrum
+    sigma_min, sigma_max = _get_spectral_bounds(C, None, None, bounds_method, seed=seed, key=bounds_key)
     kappa = sigma_max/sigma_min
 
     # Compute M and N
@@ -122,7 +138,7 @@ def logdet_stochastic_chebyshev_epsilon_delta_approx(C, epsilon=0.1, zeta=0.1, s
         print(f"Using {M} samples.")
         print(f"Using Chebyshev polynomials of order {N}.")
 
-    return logdet_stochastic_chebyshev_approx(C, sigma_max, sigma_min, sample_size=M, chebyshev_n=N)
+    return logdet_stochastic_chebyshev_approx(C, sigma_max, sigma_min, sample_size=M, chebyshev_n=N, block_size=block_size, seed=seed, n_workers=n_workers, executor=executor, backend=backend, dtype=dtype, damping=damping)
 
 
 
@@ -0,0 +1,76 @@
+import numpy as np
+
+from ..util.lanczos import batched_lanczos
+from ..util.probes import draw_probes, spawn_rngs
+from ..util.precision import resolve_dtype
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+SPECTRAL_FUNCTIONS = {
+    "log": np.log,
+    "inv": lambda x: 1.0/x,
+    "exp": np.exp,
+    "sqrt": np.sqrt,
+}
+
+
+
+def trace_fun_stochastic_lanczos_quadrature(A, f, sample_size=30, lanczos_n=50, block_size=10, tol=1e-6, method="rademacher", seed=None, dtype=None):
+    """Computes an approximation to tr(f(A)) for a symmetric matrix A using stochastic Lanczos quadrature,
+    see [12]. f is either a vectorized function of the eigenvalues or one of the keys of SPECTRAL_FUNCTIONS.
+
+    Each probe runs at most lanczos_n Lanczos steps, stopping early once its quadrature estimate changes
+    by less than tol (relative). Probes are processed in blocks of (at most) block_size vectors, so each
+    Lanczos step costs one matmat per block, and each block has its own random stream (see spawn_rngs). No
+    bounds on the spectrum of A are needed. The Lanczos vectors use the working dtype, see resolve_dtype.
+    """
+
+    # Get shape
+    n = A.shape[0]
+
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    if isinstance(f, str):
+        assert f in SPECTRAL_FUNCTIONS.keys(), f"f must be a callable or one of {list(SPECTRAL_FUNCTIONS.keys())}"
+        f = SPECTRAL_FUNCTIONS[f]
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    # Handle blocks
+    n_blocks = int(np.ceil(sample_size/block_size))
+    rngs = spawn_rngs(seed, n_blocks)
+    dtype = resolve_dtype(A, dtype)
+
+    trace_estimate = 0.0
+    for j in range(n_blocks):
+
+        # Draw random block of vectors
+        curr_block_size = min(block_size, sample_size - j*block_size)
+        V = draw_probes(n, curr_block_size, method=method, rng=rngs[j], dtype=dtype, xp=xp)
+
+        # Run Lanczos quadrature on every probe in the block
+        lanczos_data = batched_lanczos(A, V, maxits=lanczos_n, f=f, tol=tol)
+        trace_estimate += np.sum(lanczos_data["quadrature_estimates"])/sample_size
+
+    return trace_estimate
+
+
+
+def logdet_stochastic_lanczos_quadrature(C, sample_size=30, lanczos_n=50, block_size=10, tol=1e-6, method="rademacher", seed=None, dtype=None):
+    """Computes an approximation to logdet(C) for a SPD matrix C using stochastic Lanczos quadrature, see [12].
+    Unlike logdet_stochastic_chebyshev_approx, no bounds on the eigenvalues of C are required.
+    """
+
+    return trace_fun_stochastic_lanczos_quadrature(C, np.log, sample_size=sample_size, lanczos_n=lanczos_n, block_size=block_size, tol=tol, method=method, seed=seed, dtype=dtype)
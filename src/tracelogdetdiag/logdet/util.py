@@ -1,4 +1,6 @@
 import numpy as np
+from functools import lru_cache
+from scipy.fft import dct
 
 
 
@@ -21,35 +23,87 @@ def evaluate_ith_chebyshev_polynomial(xs, i):
     
 
 
-def get_chebyshev_coeff(f, n, i):
-    """Computes the ith Chebyshev coefficient in the expansion
-            f(x) \approx \sum_{j=0}^n c_j T_j(x).
-    Here f:[-1,1] \to \mathbb{R}. 
+def chebyshev_damping_factors(n, damping=None):
+    """Returns the damping factors g_0, ..., g_n for a Chebyshev expansion of degree n, which suppress the Gibbs
+    oscillations of the truncated expansion. damping is one of None (no damping), "jackson" (Jackson kernel) or
+    "lanczos" (Lanczos sigma factors).
     """
 
-    # Get nodes
+    valid_dampings = [None, "jackson", "lanczos"]
+    assert damping in valid_dampings, f"damping must be one of {valid_dampings}"
+
+    ks = np.arange(n+1)
+    if damping is None:
+        return np.ones(n+1)
+    elif damping == "jackson":
+        a = np.pi/(n+2)
+        return ( (n + 2 - ks)*np.cos(ks*a) + np.sin(ks*a)/np.tan(a) )/(n+2)
+    elif damping == "lanczos":
+        return np.sinc(ks/(n+1))
+    else:
+        raise NotImplementedError
+
+
+
+def _chebyshev_coeffs(f, n, damping):
+    # Values at the Chebyshev nodes x_k = cos(pi (k + 1/2)/(n+1))
     ks = np.arange(n+1)
     xks = np.cos(  np.pi*( ks + 0.5 )/(n+1)  )
 
-    if i == 0:
-        chebyshev_coeff = (1/(n+1))*(f(xks)*1).sum()
-    else:
-        chebyshev_coeff = (2/(n+1))*(f(xks)*evaluate_ith_chebyshev_polynomial(xks, i) ).sum()
-        
+    # c_i = (2/(n+1)) sum_k f(x_k) T_i(x_k) is a DCT-II of the values, with c_0 halved
+    chebyshev_coeffs = dct(f(xks), type=2)/(n+1)
+    chebyshev_coeffs[0] /= 2
+    chebyshev_coeffs *= chebyshev_damping_factors(n, damping)
 
-    return chebyshev_coeff
+    return chebyshev_coeffs
 
 
 
+def get_chebyshev_coeffs(f, n, damping=None):
+    """Computes all the Chebyshev coefficients c_0, ..., c_n in the expansion
+            f(x) \approx \sum_{j=0}^n c_j T_j(x)
+    at once, with a DCT of the values of f:[-1,1] \to \mathbb{R} at the n+1 Chebyshev nodes (O(n log n) instead
+    of O(n^2) for calling get_chebyshev_coeff for each i). The coefficients are optionally damped, see
+    chebyshev_damping_factors.
+    """
+
+    return _chebyshev_coeffs(f, n, damping)
+
+
+
+def get_interval_chebyshev_coeffs(f, lower, upper, n, damping=None):
+    """Returns the Chebyshev coefficients of degree n of f on the interval [lower, upper], i.e., those of
+    x -> f(((upper - lower)/2) x + (upper + lower)/2) on [-1,1], see get_chebyshev_coeffs."""
 
+    half_width, center = (upper - lower)/2, (upper + lower)/2
+    h = lambda x: f(half_width*x + center)
 
+    return get_chebyshev_coeffs(h, n, damping=damping)
 
 
 
+@lru_cache(maxsize=128)
+def _get_logdet_chebyshev_coeffs(delta, n, damping):
+    g = lambda x: ((1-2*delta)/2)*x + 0.5
+    h = lambda x: np.log(1 - g(x))
+    chebyshev_coeffs = _chebyshev_coeffs(h, n, damping)
+    chebyshev_coeffs.flags.writeable = False
+    return chebyshev_coeffs
 
 
 
+def get_logdet_chebyshev_coeffs(delta, n, damping=None):
+    """Returns the Chebyshev coefficients of degree n of x -> log(1 - ((1-2 delta)/2) x - 1/2) on [-1,1], used by
+    logdet_stochastic_chebyshev_approx, see [7]. Results are cached by (delta, n, damping)."""
 
+    return _get_logdet_chebyshev_coeffs(float(delta), n, damping).copy()
 
 
 
+def get_chebyshev_coeff(f, n, i):
+    """Computes the ith Chebyshev coefficient in the expansion
+            f(x) \approx \sum_{j=0}^n c_j T_j(x).
+    Here f:[-1,1] \to \mathbb{R}. All coefficients are computed at once, see get_chebyshev_coeffs.
+    """
+
+    return _chebyshev_coeffs(f, n, None)[i]
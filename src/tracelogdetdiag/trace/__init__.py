@@ -1,2 +1,4 @@
-from .hutchinson_trace import hutchinson_trace, hutchinson_epsilon_delta_trace, hutch_plus_plus_trace, hutch_plus_plus_epsilon_delta_trace
+from .hutchinson_trace import hutchinson_trace, hutchinson_epsilon_delta_trace, hutchinson_adaptive_trace, hutch_plus_plus_trace, hutch_plus_plus_epsilon_delta_trace, hutch_plus_plus_adaptive_trace, na_hutch_plus_plus_trace, a_hutch_plus_plus_trace
 from .explicit import explicit_trace_probe
+from .probing import probing_trace
+from .streaming import HutchinsonTraceEstimator
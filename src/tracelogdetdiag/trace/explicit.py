@@ -1,43 +1,13 @@
-import numpy as np
+from ..diag.explicit import explicit_diag_probe
 
-from .. import CUPY_INSTALLED
-if CUPY_INSTALLED:
-    import cupy as cp
-    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
-    
-    
-    
-def explicit_trace_probe(A):
-    """Computes the trace of A using an explicit probe. Requires exactly n matvecs with A.
-    """
-
-    # Setup
-    n = A.shape[0]
-    diagonal = np.zeros(n)
-    
-    # Handle CuPy
-    if CUPY_INSTALLED:
-        if isinstance(A, CuPyLinearOperator):
-            xp = cp
-        else:
-            xp = np
-    else:
-        xp = np
-    
-    for j in range(n):
 
-        # jth column of the identity
-        w = xp.zeros(n)
-        w[j] = 1.0
 
-        # Compute w^T A w
-        diagonal[j] = w.T @ (A @ w)
+def explicit_trace_probe(A, block_size=None, memory_budget=None):
+    """Computes the trace of A using an explicit probe. Requires exactly n matvecs with A, which are done
+    as matmats with blocks of columns of the identity (see explicit_diag_probe).
+    """
 
-    trace = xp.sum(diagonal)
+    diagonal = explicit_diag_probe(A, block_size=block_size, memory_budget=memory_budget)
+    trace = diagonal.sum()
 
     return trace
-
-
-
-
-
@@ -1,5 +1,11 @@
 import numpy as np
-from scipy.linalg import qr as scipy_qr
+from scipy.stats import norm as scipy_norm
+
+from ..util.running_stats import RunningMoments
+from ..util.probes import draw_probes, get_rng, get_seed_sequence, spawn_rngs
+from ..util.parallel import map_blocks
+from ..util.precision import ACCUMULATION_DTYPE, resolve_dtype
+from ..util.range_finder import orthonormal_basis, randomized_range_finder
 
 from .. import CUPY_INSTALLED
 if CUPY_INSTALLED:
@@ -8,12 +14,25 @@ if CUPY_INSTALLED:
 
 
 
-def hutchinson_trace(A, sample_size=100, block_size=20, method="rademacher", exact_sample_size=False):
+def _hutchinson_block_sum(A, n, method, dtype, use_cupy, block_size, rng):
+    """Returns the sum of w^T A w over one block of probes w drawn in dtype, accumulated in float64."""
+
+    xp = cp if use_cupy else np
+    w = draw_probes(n, block_size, method=method, rng=rng, dtype=dtype, xp=xp)
+
+    return xp.sum( ( (A.T @ w).T * w.T ).sum(axis=1, dtype=ACCUMULATION_DTYPE)  )
+
+
+
+def hutchinson_trace(A, sample_size=100, block_size=20, method="rademacher", exact_sample_size=False, seed=None, n_workers=None, executor=None, backend="thread", dtype=None):
     """Computes the Hutchinson randomized estimator of tr(A). A must be SPSD.
     
     Here we compute the estimator with sample_size using blocks of samples of size ceil(sample_size/block_size).
     This helps control memory usage vs. vectorization. We don't throw away any samples, so the estimator may be
     computed with a slightly larger sample size than specified, unless exact_sample_size=True.
+
+    Each block of probes has its own random stream (see spawn_rngs) and blocks may be evaluated in parallel (see
+    map_blocks). Probes and matvecs use the working dtype, see resolve_dtype.
     """
 
     # Get shape
@@ -32,26 +51,19 @@ def hutchinson_trace(A, sample_size=100, block_size=20, method="rademacher", exa
         xp = np
 
     # Handle blocks
-    n_blocks = int(xp.ceil(sample_size/block_size))
-    extra_samples = (block_size*n_blocks) - sample_size
+    n_blocks = int(np.ceil(sample_size/block_size))
+    rngs = spawn_rngs(seed, n_blocks)
+    dtype = resolve_dtype(A, dtype)
 
-    block_sums = []
+    block_args = []
     for j in range(n_blocks):
-
-        # Draw random block of vectors
-        if method == "standard_gaussian":
-            w = xp.random.normal(size=(n, block_size))
-        elif method == "rademacher":
-            w = xp.random.choice([-1, 1], size=(n, block_size))
-        else:
-            raise NotImplementedError
-        
+        curr_block_size = block_size
         if (j == n_blocks - 1) and (exact_sample_size == True):
-            w = w[:,:-extra_samples]
-        
-        # Append block sum
-        block_sum = xp.sum( ( (A.T @ w).T * w.T ).sum(axis=1)  )
-        block_sums.append(block_sum)
+            curr_block_size = sample_size - j*block_size
+        block_args.append( (curr_block_size, rngs[j]) )
+
+    # Block sums, in block order
+    block_sums = list(map_blocks(_hutchinson_block_sum, block_args, n_workers=n_workers, executor=executor, backend=backend, shared_args=(A, n, method, dtype, xp is not np)))
 
     tot_sum = xp.sum(xp.asarray(block_sums))
     if exact_sample_size:
@@ -63,7 +75,7 @@ def hutchinson_trace(A, sample_size=100, block_size=20, method="rademacher", exa
 
 
 
-def hutchinson_epsilon_delta_trace(A, epsilon=0.05, delta=0.05, method="rademacher", block_size=20):
+def hutchinson_epsilon_delta_trace(A, epsilon=0.05, delta=0.05, method="rademacher", block_size=20, seed=None, n_workers=None, executor=None, backend="thread", dtype=None):
     """Computes an (epsilon, delta)-estimator of trace(A). A must be SPSD. This uses lower-bounds from the literature to pick a sample size 
     for the Hutchinson estimator \hat{tr}(A) such that | \hat{tr}(A) - tr(A) | < epsilon*tr(A) with probability greater than 1 - delta."""
     
@@ -79,15 +91,93 @@ def hutchinson_epsilon_delta_trace(A, epsilon=0.05, delta=0.05, method="rademach
     else:
         raise NotImplementedError
 
-    return hutchinson_trace(A, sample_size=sample_size, method=method, block_size=block_size)
+    return hutchinson_trace(A, sample_size=sample_size, method=method, block_size=block_size, seed=seed, n_workers=n_workers, executor=executor, backend=backend, dtype=dtype)
+
 
 
+def _adaptive_hutchinson(sample_fn, n, rtol, atol, confidence, block_size, min_sample_size, max_sample_size, method, xp, seed_seq, dtype=np.float64):
+    """Draws blocks of probes and feeds them to sample_fn, which returns one sample of the quantity of interest
+    per probe, until the confidence interval of the running mean is within max(atol, rtol*|mean|) or 
+    max_sample_size probes have been used. Each block is drawn in dtype from a new stream spawned from seed_seq."""
 
-def hutch_plus_plus_trace(A, sample_size=30, method="rademacher"):
+    z = scipy_norm.ppf(0.5 + confidence/2)
+    moments = RunningMoments()
+    converged = False
+    half_width = np.inf
+
+    while moments.count < max_sample_size:
+
+        # Draw random block of vectors
+        curr_block_size = min(block_size, max_sample_size - moments.count)
+        w = draw_probes(n, curr_block_size, method=method, rng=spawn_rngs(seed_seq, 1)[0], dtype=dtype, xp=xp)
+
+        # Update running moments
+        samples = sample_fn(w)
+        if xp != np:
+            samples = cp.asnumpy(samples)
+        moments.update(samples)
+
+        # Check the confidence interval
+        half_width = z*moments.standard_error
+        if (moments.count >= min_sample_size) and (half_width <= max(atol, rtol*abs(moments.mean))):
+            converged = True
+            break
+
+    data = {
+        "estimate": float(moments.mean),
+        "error": float(half_width),
+        "sample_size": moments.count,
+        "converged": converged,
+    }
+
+    return data
+
+
+
+def hutchinson_adaptive_trace(A, rtol=1e-2, atol=0.0, confidence=0.95, block_size=20, min_sample_size=None, max_sample_size=10000, method="rademacher", seed=None, dtype=None):
+    """Computes the Hutchinson randomized estimator of tr(A), drawing blocks of block_size probes until the
+    (normal approximation) confidence interval at level confidence has half-width below max(atol, rtol*|estimate|),
+    or max_sample_size probes have been used. The running mean and variance of the per-probe estimates are
+    tracked with Welford's algorithm. A must be SPSD.
+
+    Unlike hutchinson_epsilon_delta_trace, the sample size is chosen from the observed variance rather than a
+    worst-case bound. Returns a dict with the "estimate", the confidence interval half-width "error", the 
+    "sample_size" used and whether the tolerance was met ("converged"). Probes and matvecs use dtype, see
+    hutchinson_trace.
+    """
+
+    # Get shape
+    n = A.shape[0]
+
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    if min_sample_size is None:
+        min_sample_size = 2*block_size
+
+    sample_fn = lambda w: xp.sum( (A.T @ w) * w, axis=0, dtype=ACCUMULATION_DTYPE )
+
+    return _adaptive_hutchinson(sample_fn, n, rtol, atol, confidence, block_size, min_sample_size, max_sample_size, method, xp, get_seed_sequence(seed), resolve_dtype(A, dtype))
+
+
+
+def hutch_plus_plus_trace(A, sample_size=30, method="rademacher", sketch_size=None, seed=None, dtype=None):
     """Computes the Hutch++ randomized estimator of tr(A). A must be SPSD. This is an improved estimator over
     the Hutchinson estimator. See [9].
     
-    sample_size must be a multiple of 3.
+    Exactly sample_size matvecs with A are used: sketch_size for the range sketch, sketch_size for the
+    low-rank trace and the remaining sample_size - 2*sketch_size for the Hutchinson estimate of the remainder.
+    By default sketch_size = sample_size // 3, which is the standard split of [9] when sample_size is a
+    multiple of 3. The probes and matvecs use dtype, while the traces are accumulated in float64.
     """
 
     # Get shape
@@ -105,35 +195,170 @@ def hutch_plus_plus_trace(A, sample_size=30, method="rademacher"):
     valid_methods = ["standard_gaussian", "rademacher"]
     assert method in valid_methods, f"method must be one of {valid_methods}"
 
-    assert sample_size % 3 == 0, "sample_size must be a multiple of 3."
+    if sketch_size is None:
+        sketch_size = sample_size // 3
+    hutchinson_size = sample_size - 2*sketch_size
+    assert hutchinson_size >= 0, "sample_size must be at least 2*sketch_size."
     
-    if method == "rademacher":
-        S = xp.random.choice([-1, 1], size=(n, int(sample_size/3)))
-        G = xp.random.choice([-1, 1], size=(n, int(sample_size/3)))
-    elif method == "standard_gaussian":
-        S = xp.random.normal(size=(n, int(sample_size/3)))
-        G = xp.random.normal(size=(n, int(sample_size/3)))
+    dtype = resolve_dtype(A, dtype)
+    rng = get_rng(seed)
+    S = draw_probes(n, sketch_size, method=method, rng=rng, dtype=dtype, xp=xp)
+    G = draw_probes(n, hutchinson_size, method=method, rng=rng, dtype=dtype, xp=xp)
+
+    # Range approximation of A
+    Q = randomized_range_finder(A, S)
+
+    # Compute approximate trace
+    term1 = xp.trace(Q.T @ ( A @ Q ), dtype=ACCUMULATION_DTYPE)
+    if hutchinson_size > 0:
+        tmp =  A @ ( G - ( Q @ ( Q.T @ G ) ) )
+        tmp2 = G.T @ ( tmp - Q @ ( Q.T @ tmp ) )
+        term2 = (1/hutchinson_size)*xp.trace(tmp2, dtype=ACCUMULATION_DTYPE)
     else:
-        raise NotImplementedError
+        term2 = 0.0
+    trace_estimate = term1 + term2
+    
+    return trace_estimate
+
+
+
+def na_hutch_plus_plus_trace(A, sample_size=30, method="rademacher", c1=1/6, c2=1/3, seed=None, dtype=None):
+    """Computes the non-adaptive NA-Hutch++ randomized estimator of tr(A), see [9]. A must be SPSD.
 
-    # Do QR decomp
-    if xp == np: 
-        Q, _ = scipy_qr(A @ S, mode="economic")
+    All sample_size matvecs with A are done in a single pass (one matmat), which is preferable when each pass
+    over A is expensive. Fractions c1 and c2 < 1 - c1 of the matvecs are used for the sketches S and R, and the 
+    rest for the Hutchinson estimate of the remainder. The probes and matvecs use dtype, while the traces are
+    accumulated in float64, see hutchinson_trace.
+    """
+
+    # Get shape
+    n = A.shape[0]
+    
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
     else:
-        Q, _ = cp.linalg.qr(A @ S, mode="reduced")
+        xp = np
 
-    # Compute approximate trace
-    term1 = xp.trace(Q.T @ ( A @ Q ) )
-    tmp =  A @ ( G - ( Q @ ( Q.T @ G ) ) )
-    tmp2 = G.T @ ( tmp - Q @ ( Q.T @ tmp ) )
-    term2 = (3/sample_size)*xp.trace(tmp2)
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    # Sizes of the S, R and G blocks
+    s_size = max(1, int(round(c1*sample_size)))
+    r_size = max(1, int(round(c2*sample_size)))
+    g_size = sample_size - s_size - r_size
+    assert g_size >= 0, "sample_size is too small for the given c1 and c2."
+
+    dtype = resolve_dtype(A, dtype)
+    X = draw_probes(n, sample_size, method=method, rng=get_rng(seed), dtype=dtype, xp=xp)
+
+    # Single pass over A
+    AX = A @ X
+    S, R, G = X[:,:s_size], X[:,s_size:s_size+r_size], X[:,s_size+r_size:]
+    W, Z, Y = AX[:,:s_size], AX[:,s_size:s_size+r_size], AX[:,s_size+r_size:]
+
+    # Low-rank part tr((S^T Z)^+ (W^T Z))
+    StZ_pinv = xp.linalg.pinv(S.T @ Z)
+    term1 = xp.trace(StZ_pinv @ (W.T @ Z), dtype=ACCUMULATION_DTYPE)
+
+    # Hutchinson estimate of the remainder
+    if g_size > 0:
+        term2 = (1/g_size)*( xp.trace(G.T @ Y, dtype=ACCUMULATION_DTYPE) - xp.trace( (G.T @ Z) @ (StZ_pinv @ (W.T @ G)), dtype=ACCUMULATION_DTYPE ) )
+    else:
+        term2 = 0.0
     trace_estimate = term1 + term2
+
+    return trace_estimate
+
+
+
+def a_hutch_plus_plus_trace(A, epsilon=0.05, delta=0.05, method="rademacher", block_size=5, test_size=5, max_sketch_size=None, max_sample_size=10000, seed=None, dtype=None):
+    """Computes the adaptive A-Hutch++ randomized estimator of tr(A), see [10]. A must be SPSD.
+
+    Instead of a fixed split, the range sketch is grown by block_size vectors at a time. After each step the 
+    number N of Hutchinson probes needed for the remainder to reach relative accuracy epsilon with probability
+    1 - delta is predicted from 4 log(2/delta) ||(I - QQ^T) A||_F^2 / (epsilon tr(A))^2, with ||(I - QQ^T) A||_F
+    and tr(A) estimated from a fixed set of test_size probes. The sketch stops growing once another block would
+    save fewer than 2*block_size Hutchinson probes, and the remainder is then estimated with N probes (at most
+    max_sample_size), drawn in blocks of block_size. These are fresh probes: the test probes decided when to
+    stop, so reusing them for the remainder would bias it. Probes and matvecs use the working dtype, see
+    resolve_dtype.
+    """
+
+    # Get shape
+    n = A.shape[0]
     
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    if max_sketch_size is None:
+        max_sketch_size = n
+
+    dtype = resolve_dtype(A, dtype)
+    rng = get_rng(seed)
+    draw = lambda k: draw_probes(n, k, method=method, rng=rng, dtype=dtype, xp=xp)
+
+    # Test probes for the trace and residual norm estimates
+    G_test = draw(test_size)
+    AG_test = A @ G_test
+    trace_scale = abs(float(xp.sum(G_test*AG_test, dtype=ACCUMULATION_DTYPE)))/test_size
+    c = 4*np.log(2/delta)/((epsilon*trace_scale)**2)
+
+    # Predicted number of Hutchinson probes for the remainder
+    def predict_n_probes(Q):
+        residual = AG_test - Q @ ( Q.T @ AG_test )
+        residual_norm_sq = float(xp.sum(residual*residual, dtype=ACCUMULATION_DTYPE))/test_size
+        return int(np.ceil(c*residual_norm_sq))
+
+    # Grow the sketch
+    Y = xp.zeros((n, 0), dtype=dtype)
+    Q = xp.zeros((n, 0), dtype=dtype)
+    n_probes = predict_n_probes(Q)
+    while Y.shape[1] < max_sketch_size:
+
+        curr_block_size = min(block_size, max_sketch_size - Y.shape[1])
+        Y = xp.concatenate([Y, A @ draw(curr_block_size)], axis=1)
+        Q = orthonormal_basis(Y)
+
+        new_n_probes = predict_n_probes(Q)
+        saved = n_probes - new_n_probes
+        n_probes = new_n_probes
+        if (saved < 2*block_size) or (n_probes <= 2*block_size):
+            break
+
+    # Low-rank part
+    AQ = A @ Q
+    term1 = xp.trace(Q.T @ AQ, dtype=ACCUMULATION_DTYPE)
+
+    # Hutchinson estimate of the remainder with fresh probes, A (I - QQ^T) G = AG - AQ Q^T G
+    n_probes = min(n_probes, max_sample_size)
+    remainder = 0.0
+    for start in range(0, n_probes, block_size):
+        G = draw(min(block_size, n_probes - start))
+        W = G - Q @ ( Q.T @ G )
+        tmp = A @ G - AQ @ ( Q.T @ G )
+        remainder += xp.sum( W * ( tmp - Q @ ( Q.T @ tmp ) ), dtype=ACCUMULATION_DTYPE )
+
+    term2 = remainder/n_probes if n_probes > 0 else 0.0
+    trace_estimate = term1 + term2
+
     return trace_estimate
 
 
 
-def hutch_plus_plus_epsilon_delta_trace(A, epsilon=0.05, delta=0.05, method="rademacher"):
+def hutch_plus_plus_epsilon_delta_trace(A, epsilon=0.05, delta=0.05, method="rademacher", seed=None, dtype=None):
     """Computes an (epsilon, delta)-estimator of trace(A) using the Hutch++ algorithm. A must be SPSD. This uses lower-bounds from the literature to pick a sample size 
     for the Hutch++ estimator \hat{tr}(A) such that | \hat{tr}(A) - tr(A) | < epsilon*tr(A) with probability greater than 1 - delta. See [9]."""
     
@@ -143,8 +368,52 @@ def hutch_plus_plus_epsilon_delta_trace(A, epsilon=0.05, delta=0.05, method="rad
     sample_size = int( np.ceil( (np.sqrt(np.log(1/delta))/epsilon) + np.log(1/delta) ) )
     sample_size = int(3*np.ceil(sample_size/3))
 
-    return hutch_plus_plus_trace(A, sample_size=sample_size, method=method)
+    return hutch_plus_plus_trace(A, sample_size=sample_size, method=method, seed=seed, dtype=dtype)
+
+
+
+def hutch_plus_plus_adaptive_trace(A, sketch_size=10, rtol=1e-2, atol=0.0, confidence=0.95, block_size=20, min_sample_size=None, max_sample_size=10000, method="rademacher", seed=None, dtype=None):
+    """Computes a Hutch++ estimator of tr(A), see [9], where the low-rank part uses a sketch of sketch_size
+    vectors and the Hutchinson estimate of the remainder tr((I - QQ^T) A (I - QQ^T)) draws probes adaptively
+    as in hutchinson_adaptive_trace. A must be SPSD.
+
+    Returns a dict with the "estimate", the confidence interval half-width "error" (of the remainder, the 
+    low-rank part is exact), the "sample_size" used for the remainder and "converged". Probes and matvecs
+    use dtype, see hutchinson_trace.
+    """
+
+    # Get shape
+    n = A.shape[0]
+
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    if min_sample_size is None:
+        min_sample_size = 2*block_size
 
+    # Low-rank part
+    dtype = resolve_dtype(A, dtype)
+    seed_seq = get_seed_sequence(seed)
+    S = draw_probes(n, sketch_size, method=method, rng=spawn_rngs(seed_seq, 1)[0], dtype=dtype, xp=xp)
+    Q = randomized_range_finder(A, S)
+    term1 = xp.trace(Q.T @ ( A @ Q ), dtype=ACCUMULATION_DTYPE)
 
+    # Adaptive Hutchinson on the deflated remainder
+    def sample_fn(w):
+        w = w - ( Q @ ( Q.T @ w ) )
+        tmp = A @ w
+        return xp.sum( w * ( tmp - Q @ ( Q.T @ tmp ) ), axis=0, dtype=ACCUMULATION_DTYPE )
 
+    data = _adaptive_hutchinson(sample_fn, n, rtol, atol, confidence, block_size, min_sample_size, max_sample_size, method, xp, seed_seq, dtype)
+    data["estimate"] += float(term1)
 
+    return data
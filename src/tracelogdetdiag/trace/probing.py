@@ -0,0 +1,10 @@
+from ..diag.probing import probing_diag
+
+
+
+def probing_trace(A, pattern=None, distance=1, method="coloring", sample_size=None, block_size=None, memory_budget=None):
+    """Estimates tr(A) as the sum of the probing estimate of diag(A), see probing_diag."""
+
+    diagonal = probing_diag(A, pattern=pattern, distance=distance, method=method, sample_size=sample_size, block_size=block_size, memory_budget=memory_budget)
+
+    return diagonal.sum()
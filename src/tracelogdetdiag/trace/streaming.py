@@ -0,0 +1,118 @@
+import numpy as np
+from scipy.stats import norm as scipy_norm
+
+from ..util.running_stats import RunningMoments
+from ..util.probes import draw_probes, get_seed_sequence, seed_sequence_state, seed_sequence_from_state
+from ..util.precision import ACCUMULATION_DTYPE, resolve_dtype
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+
+class HutchinsonTraceEstimator:
+    """Hutchinson estimator of tr(A) that can be updated with more probes and merged with other estimators, see
+    hutchinson_trace. A must be SPSD.
+
+    The sufficient statistics are the running mean and variance of the per-probe estimates w^T A w (see
+    RunningMoments), so update(n_probes) can be called until result() is accurate enough, and estimators of the
+    same A run e.g. in different batch jobs can be combined with merge. Each block of block_size probes is drawn
+    from a new stream spawned from seed; estimators to be merged must use different seeds, e.g.
+    np.random.SeedSequence(seed).spawn(n_jobs). state_dict and from_state_dict save and restore the statistics
+    together with the position in the random stream. Probes and matvecs use dtype, see hutchinson_trace.
+    """
+
+    def __init__(self, A, block_size=20, method="rademacher", seed=None, dtype=None):
+
+        valid_methods = ["standard_gaussian", "rademacher"]
+        assert method in valid_methods, f"method must be one of {valid_methods}"
+
+        # Bind
+        self.A = A
+        self.n = A.shape[0]
+        self.block_size = block_size
+        self.method = method
+        self.dtype = resolve_dtype(A, dtype)
+        self.moments = RunningMoments()
+        self._seed_seq = get_seed_sequence(seed)
+
+        # Handle CuPy
+        if CUPY_INSTALLED:
+            if isinstance(A, CuPyLinearOperator):
+                self.xp = cp
+            else:
+                self.xp = np
+        else:
+            self.xp = np
+
+    @property
+    def sample_size(self):
+        """Number of probes used so far."""
+        return self.moments.count
+
+    def update(self, n_probes):
+        """Draws n_probes more probes, in blocks of (at most) block_size, and adds them to the estimate."""
+
+        xp = self.xp
+        for start in range(0, n_probes, self.block_size):
+
+            # Draw random block of vectors
+            curr_block_size = min(self.block_size, n_probes - start)
+            rng = np.random.default_rng(self._seed_seq.spawn(1)[0])
+            w = draw_probes(self.n, curr_block_size, method=self.method, rng=rng, dtype=self.dtype, xp=xp)
+
+            samples = xp.sum( (self.A.T @ w) * w, axis=0, dtype=ACCUMULATION_DTYPE )
+            if xp != np:
+                samples = cp.asnumpy(samples)
+            self.moments.update(samples)
+
+        return self
+
+    def merge(self, other):
+        """Adds the probes of the estimator other (of the same A, drawn with a different seed) to self."""
+
+        assert other.n == self.n, "Estimators must be of operators of the same shape."
+        assert other.method == self.method, "Estimators must use the same probe method."
+        assert (other._seed_seq.entropy, other._seed_seq.spawn_key) != (self._seed_seq.entropy, self._seed_seq.spawn_key), "Estimators with the same seed draw the same probes and cannot be merged."
+        self.moments.merge(other.moments)
+
+        return self
+
+    def result(self, confidence=0.95):
+        """Returns a dict with the "estimate" of tr(A), the half-width "error" of its (normal approximation)
+        confidence interval at level confidence, and the "sample_size" used."""
+
+        z = scipy_norm.ppf(0.5 + confidence/2)
+        data = {
+            "estimate": float(self.moments.mean),
+            "error": float(z*self.moments.standard_error),
+            "sample_size": self.moments.count,
+        }
+
+        return data
+
+    def state_dict(self):
+        """Returns the sufficient statistics and random stream state as a dict of plain Python types."""
+
+        state = {
+            "n": self.n,
+            "block_size": self.block_size,
+            "method": self.method,
+            "dtype": np.dtype(self.dtype).name,
+            "moments": self.moments.state_dict(),
+            "seed_sequence": seed_sequence_state(self._seed_seq),
+        }
+
+        return state
+
+    @classmethod
+    def from_state_dict(cls, A, state):
+        """Restores an estimator of A from the output of state_dict. Further updates continue its random stream."""
+
+        assert A.shape[0] == state["n"], "A does not match the saved estimator."
+        estimator = cls(A, block_size=state["block_size"], method=state["method"], seed=seed_sequence_from_state(state["seed_sequence"]), dtype=np.dtype(state["dtype"]))
+        estimator.moments = RunningMoments.from_state_dict(state["moments"])
+
+        return estimator
@@ -1,13 +1,2 @@
-
-
-
-
-
-
-
-
-
-
-
-
-
+from .traceinv import get_Ainv_operator, hutchinson_traceinv, hutch_plus_plus_traceinv, traceinv_stochastic_lanczos_quadrature, traceinv_stochastic_chebyshev_approx
+from .explicit import traceinv_via_cholesky
@@ -0,0 +1,17 @@
+from ..util.factorization import factorize
+
+
+
+def traceinv_via_cholesky(A, method="cholesky", factorization=None, key=None):
+    """Computes tr(A^{-1}) using the Cholesky method, as tr(A^{-1}) = || L^{-1} ||_F^2 where A = L L^T. 
+    A must be SPD.
+
+    With method="banded_cholesky" or "sparse_cholesky" the diagonal of A^{-1} is computed by selected inversion
+    instead, see Factorization.diaginv. A Factorization may be passed explicitly, otherwise one is
+    computed (and cached if key is given, see factorize).
+    """
+
+    if factorization is None:
+        factorization = factorize(A, method=method, key=key)
+
+    return factorization.traceinv()
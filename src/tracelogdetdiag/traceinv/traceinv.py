@@ -0,0 +1,89 @@
+import numpy as np
+from scipy.sparse.linalg import LinearOperator
+
+from ..trace import hutchinson_trace, hutch_plus_plus_trace
+from ..logdet import trace_fun_stochastic_lanczos_quadrature, trace_fun_stochastic_chebyshev_approx
+from ..util import AinvCGLinearOperator
+from ..util.cholesky import CHOLESKY_BACKENDS
+from ..util.factorization import factorize
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+    from ..util import AinvCGCuPyLinearOperator
+
+
+
+def get_Ainv_operator(A, solver="cg", cg_tol=1e-4, cg_maxits=1000, M=None, factorization=None, recycle_k=0, key=None):
+    """Returns a linear operator representing A^{-1} for a SPD matrix A.
+
+    solver="cg" solves with (preconditioned) conjugate gradients, all columns of a block at once. If recycle_k > 0,
+    later blocks are solved with deflated CG on recycle_k approximate eigenvectors harvested from earlier solves,
+    see AinvCGLinearOperator.
+    solver="cholesky" factors (a dense copy of) A once and applies A^{-1} by triangular solves, and
+    "banded_cholesky" and "sparse_cholesky" do the same with a banded or sparse factorization. A Factorization
+    may be passed explicitly, otherwise one is computed (and cached if key is given, see factorize).
+    """
+
+    valid_solvers = ["cg"] + list(CHOLESKY_BACKENDS.keys())
+    assert solver in valid_solvers, f"solver must be one of {valid_solvers}"
+
+    if solver == "cg":
+        if CUPY_INSTALLED and isinstance(A, CuPyLinearOperator):
+            Ainv = AinvCGCuPyLinearOperator(A, cg_tol=cg_tol, cg_maxits=cg_maxits, use_prev=False, M=M, recycle_k=recycle_k)
+        else:
+            Ainv = AinvCGLinearOperator(A, cg_tol=cg_tol, cg_maxits=cg_maxits, use_prev=False, M=M, recycle_k=recycle_k)
+    elif solver in CHOLESKY_BACKENDS.keys():
+        if factorization is None:
+            factorization = factorize(A, method=solver, key=key)
+        _solve = factorization.solve
+        Ainv = LinearOperator(A.shape, matvec=_solve, rmatvec=_solve, matmat=_solve, rmatmat=_solve, dtype=np.float64)
+    else:
+        raise NotImplementedError
+
+    return Ainv
+
+
+
+def hutchinson_traceinv(A, sample_size=100, block_size=20, method="rademacher", solver="cg", cg_tol=1e-4, cg_maxits=1000, M=None, seed=None, recycle_k=0):
+    """Computes the Hutchinson randomized estimator of tr(A^{-1}). A must be SPD. 
+
+    Each block of probes is solved for at once, see get_Ainv_operator for the solver options.
+    """
+
+    Ainv = get_Ainv_operator(A, solver=solver, cg_tol=cg_tol, cg_maxits=cg_maxits, M=M, recycle_k=recycle_k)
+
+    return hutchinson_trace(Ainv, sample_size=sample_size, block_size=block_size, method=method, seed=seed)
+
+
+
+def hutch_plus_plus_traceinv(A, sample_size=30, method="rademacher", solver="cg", cg_tol=1e-4, cg_maxits=1000, M=None, seed=None, recycle_k=0):
+    """Computes the Hutch++ randomized estimator of tr(A^{-1}), see [9]. A must be SPD.
+
+    See hutch_plus_plus_trace for how sample_size is split, and get_Ainv_operator for the solver options.
+    """
+
+    Ainv = get_Ainv_operator(A, solver=solver, cg_tol=cg_tol, cg_maxits=cg_maxits, M=M, recycle_k=recycle_k)
+
+    return hutch_plus_plus_trace(Ainv, sample_size=sample_size, method=method, seed=seed)
+
+
+
+def traceinv_stochastic_lanczos_quadrature(A, sample_size=30, lanczos_n=50, block_size=10, tol=1e-6, method="rademacher", seed=None):
+    """Computes an approximation to tr(A^{-1}) for a SPD matrix A using stochastic Lanczos quadrature, see [12].
+    This only needs matmats with A, no linear solves.
+    """
+
+    return trace_fun_stochastic_lanczos_quadrature(A, "inv", sample_size=sample_size, lanczos_n=lanczos_n, block_size=block_size, tol=tol, method=method, seed=seed)
+
+
+
+def traceinv_stochastic_chebyshev_approx(A, sigma_min=None, sigma_max=None, sample_size=100, chebyshev_n=30, block_size=20, bounds_method="lanczos", bounds_key=None, method="rademacher", seed=None, damping=None):
+    """Computes an approximation to tr(A^{-1}) for a SPD matrix A with eigenvalues in [sigma_min, sigma_max] using a
+    stochastic Chebyshev expansion of 1/x, see trace_fun_stochastic_chebyshev_approx. Like stochastic Lanczos
+    quadrature this only needs matmats with A. The degree needed grows like sqrt(sigma_max/sigma_min).
+    If sigma_min is estimated (see spectral_bounds) it may lie above the smallest eigenvalues, where 1/x is largest,
+    so pass a known lower bound when possible. bounds_key caches the estimated bounds, see spectral_bounds.
+    """
+
+    return trace_fun_stochastic_chebyshev_approx(A, "inv", sigma_min=sigma_min, sigma_max=sigma_max, sample_size=sample_size, chebyshev_n=chebyshev_n, block_size=block_size, bounds_method=bounds_method, bounds_key=bounds_key, method=method, seed=seed, damping=damping)
@@ -1,3 +1,5 @@
+import warnings
+
 import numpy as np
 from scipy.sparse.linalg import LinearOperator
 
@@ -6,14 +8,29 @@ if CUPY_INSTALLED:
     import cupy as cp
     from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
 
-from .cg import relative_resigual_cg
+from .cg import relative_resigual_cg, batched_relative_residual_cg, ritz_deflation_space
+
+
+def _warn_not_converged(converged, cg_maxits, cg_tol):
+    """Warns if CG did not converge for some right-hand sides, given the "converged" flag(s) of the solve."""
+    n_failed = int(not converged) if isinstance(converged, bool) else int((~converged).sum())
+    if n_failed > 0:
+        warnings.warn(f"CG did not reach the relative residual {cg_tol} within {cg_maxits} iterations for {n_failed} right-hand side(s), the result is inaccurate.", RuntimeWarning, stacklevel=3)
 
 
 class AinvCGLinearOperator(LinearOperator):
     """Subclass of LinearOperator that represents A^{-1}, where A^{-1} x is computed approximately
-      by the conjugate gradient method."""
+      by the conjugate gradient method. An optional preconditioner M \approx A^{-1} may be supplied.
+      The number of CG iterations used for each solved right-hand side is recorded in self.iterations,
+      and a RuntimeWarning is emitted for solves that do not converge within cg_maxits iterations.
+
+      use_prev=True warm-starts each solve from the previous solution, which only helps for correlated right-hand
+      sides. For many independent right-hand sides (e.g. random probes), recycle_k > 0 instead keeps a deflation
+      space of recycle_k approximate eigenvectors for the smallest eigenvalues of A, refined after every solve
+      from the new solutions (see ritz_deflation_space, one extra matmat per solve), and uses deflated CG for
+      later solves. Refinement stops once all Ritz residuals are below recycle_tol (relative)."""
 
-    def __init__(self, A, cg_tol=1e-4, cg_maxits=1000, use_prev=True):
+    def __init__(self, A, cg_tol=1e-4, cg_maxits=1000, use_prev=True, M=None, recycle_k=0, recycle_tol=1e-2):
 
         # Bind
         self.A = A
@@ -21,27 +38,56 @@ class AinvCGLinearOperator(LinearOperator):
         self.cg_maxits = cg_maxits
         self.x0 = None
         self.use_prev = use_prev
+        self.M = M
+        self.iterations = []
+        self.recycle_k = recycle_k
+        self.recycle_tol = recycle_tol
+        self.U = None
+        self.AU = None
+        self.recycle_converged = False
         self.shape = self.A.shape
         self.dtype = self.A.dtype
 
         # Super
         super().__init__(self.dtype, self.shape)
 
+    @property
+    def stateful(self):
+        """True if solves depend on earlier solves (use_prev or recycle_k > 0), see map_blocks."""
+        return self.use_prev or (self.recycle_k > 0)
+
     def _matvec(self, x):
         # Compute approximate sol
-        approx_sol = relative_resigual_cg(self.A, x, eps=self.cg_tol, maxits=self.cg_maxits, x0=self.x0)
+        approx_sol = relative_resigual_cg(self.A, x, eps=self.cg_tol, maxits=self.cg_maxits, x0=self.x0, M=self.M, W=self.U, AW=self.AU)
+        self.iterations.append(approx_sol["iterations"])
+        _warn_not_converged(approx_sol["converged"], self.cg_maxits, self.cg_tol)
         approx_sol = approx_sol["x"]
+        self._update_recycle_space(approx_sol.reshape(-1,1))
         if self.use_prev: self.x0 = approx_sol
 
         return approx_sol
     
     def _matmat(self, B):
-        output_shape = (self.shape[0], B.shape[1])
-        result = np.zeros(output_shape)
-        for j in range(B.shape[1]):
-            result[:,j] = self._matvec(B[:,j])
-        return result
+        # Solve for all columns at once
+        X0 = None
+        if self.x0 is not None:
+            X0 = np.tile(self.x0.reshape(-1,1), (1, B.shape[1]))
+        approx_sol = batched_relative_residual_cg(self.A, B, eps=self.cg_tol, maxits=self.cg_maxits, X0=X0, M=self.M, W=self.U, AW=self.AU)
+        self.iterations.extend(approx_sol["iterations"].tolist())
+        _warn_not_converged(approx_sol["converged"], self.cg_maxits, self.cg_tol)
+        approx_sol = approx_sol["x"]
+        self._update_recycle_space(approx_sol)
+        if self.use_prev: self.x0 = approx_sol[:,-1]
+
+        return approx_sol
     
+    def _update_recycle_space(self, X):
+        # Refine the deflation space with the new solutions
+        if (self.recycle_k == 0) or self.recycle_converged:
+            return
+        self.U, self.AU, thetas, residual_norms = ritz_deflation_space(self.A, X, self.recycle_k, U=self.U)
+        self.recycle_converged = (self.U.shape[1] == self.recycle_k) and bool(np.all(residual_norms <= self.recycle_tol*np.abs(thetas)))
+
     def _rmatmat(self, B):
         return self._matmat(B)
     
@@ -55,9 +101,17 @@ if CUPY_INSTALLED:
     
     class AinvCGCuPyLinearOperator(CuPyLinearOperator):
         """Subclass of CuPyLinearOperator that represents A^{-1}, where A^{-1} x is computed approximately
-          by the conjugate gradient method."""
+          by the conjugate gradient method. An optional preconditioner M \approx A^{-1} may be supplied.
+          The number of CG iterations used for each solved right-hand side is recorded in self.iterations,
+          and a RuntimeWarning is emitted for solves that do not converge within cg_maxits iterations.
+
+          use_prev=True warm-starts each solve from the previous solution, which only helps for correlated right-hand
+          sides. For many independent right-hand sides (e.g. random probes), recycle_k > 0 instead keeps a deflation
+          space of recycle_k approximate eigenvectors for the smallest eigenvalues of A, refined after every solve
+          from the new solutions (see ritz_deflation_space, one extra matmat per solve), and uses deflated CG for
+          later solves. Refinement stops once all Ritz residuals are below recycle_tol (relative)."""
 
-        def __init__(self, A, cg_tol=1e-4, cg_maxits=1000, use_prev=True):
+        def __init__(self, A, cg_tol=1e-4, cg_maxits=1000, use_prev=True, M=None, recycle_k=0, recycle_tol=1e-2):
 
             # Bind
             self.A = A
@@ -65,26 +119,55 @@ if CUPY_INSTALLED:
             self.cg_maxits = cg_maxits
             self.x0 = None
             self.use_prev = use_prev
+            self.M = M
+            self.iterations = []
+            self.recycle_k = recycle_k
+            self.recycle_tol = recycle_tol
+            self.U = None
+            self.AU = None
+            self.recycle_converged = False
             self.shape = self.A.shape
             self.dtype = self.A.dtype
 
             # Super
             super().__init__(self.dtype, self.shape)
 
+        @property
+        def stateful(self):
+            """True if solves depend on earlier solves (use_prev or recycle_k > 0), see map_blocks."""
+            return self.use_prev or (self.recycle_k > 0)
+
         def _matvec(self, x):
             # Compute approximate sol
-            approx_sol = relative_resigual_cg(self.A, x, eps=self.cg_tol, maxits=self.cg_maxits, x0=self.x0)
+            approx_sol = relative_resigual_cg(self.A, x, eps=self.cg_tol, maxits=self.cg_maxits, x0=self.x0, M=self.M, W=self.U, AW=self.AU)
+            self.iterations.append(approx_sol["iterations"])
+            _warn_not_converged(approx_sol["converged"], self.cg_maxits, self.cg_tol)
             approx_sol = approx_sol["x"]
+            self._update_recycle_space(approx_sol.reshape(-1,1))
             if self.use_prev: self.x0 = approx_sol
 
             return approx_sol
 
         def _matmat(self, B):
-            output_shape = (self.shape[0], B.shape[1])
-            result = cp.zeros(output_shape)
-            for j in range(B.shape[1]):
-                result[:,j] = self._matvec(B[:,j])
-            return result
+            # Solve for all columns at once
+            X0 = None
+            if self.x0 is not None:
+                X0 = cp.tile(self.x0.reshape(-1,1), (1, B.shape[1]))
+            approx_sol = batched_relative_residual_cg(self.A, B, eps=self.cg_tol, maxits=self.cg_maxits, X0=X0, M=self.M, W=self.U, AW=self.AU)
+            self.iterations.extend(approx_sol["iterations"].tolist())
+            _warn_not_converged(approx_sol["converged"], self.cg_maxits, self.cg_tol)
+            approx_sol = approx_sol["x"]
+            self._update_recycle_space(approx_sol)
+            if self.use_prev: self.x0 = approx_sol[:,-1]
+
+            return approx_sol
+
+        def _update_recycle_space(self, X):
+            # Refine the deflation space with the new solutions
+            if (self.recycle_k == 0) or self.recycle_converged:
+                return
+            self.U, self.AU, thetas, residual_norms = ritz_deflation_space(self.A, X, self.recycle_k, U=self.U)
+            self.recycle_converged = (self.U.shape[1] == self.recycle_k) and bool(cp.all(residual_norms <= self.recycle_tol*cp.abs(thetas)))
 
         def _rmatmat(self, B):
             return self._matmat(B)
@@ -1,5 +1,21 @@
-from .cg import relative_resigual_cg
+from .cg import relative_resigual_cg, batched_relative_residual_cg, ritz_deflation_space
 from .AinvCGLinearOperator import AinvCGLinearOperator
+from .lanczos import batched_lanczos, lanczos_quadrature
+from .preconditioners import jacobi_preconditioner, incomplete_cholesky, incomplete_cholesky_preconditioner
+from .cache import IdentityCache
+from .blocks import get_block_size
+from .precision import ACCUMULATION_DTYPE, resolve_dtype, adjust_tolerance
+from .probes import get_seed_sequence, get_rng, spawn_rngs, rademacher_probes, gaussian_probes, draw_probes, seed_sequence_state, seed_sequence_from_state
+from .running_stats import RunningMoments
+from .parallel import map_blocks
+from .probing import greedy_coloring, coloring_probes, hadamard_probes
+from .range_finder import orthonormal_basis, randomized_range_finder
+from .spectral_bounds import spectral_bounds, lanczos_spectral_bounds, gershgorin_spectral_bounds, widen_spectral_bounds, clear_spectral_bounds_cache
+from .chebyshev import chebyshev_moments_block, stochastic_chebyshev_moments
+from .probe_session import ProbeSession
+from .out_of_core import MemmapLinearOperator, ShardedCSRLinearOperator, write_csr_shards
+from .cholesky import CHOLESKY_BACKENDS, get_bandwidth, to_lower_banded, banded_cholesky, sparse_cholesky, banded_selected_inversion, sparse_selected_inversion
+from .factorization import Factorization, factorize, set_factorization_cache_size, clear_factorization_cache
 
 from .. import CUPY_INSTALLED
 if CUPY_INSTALLED:
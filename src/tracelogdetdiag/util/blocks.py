@@ -0,0 +1,20 @@
+DEFAULT_MEMORY_BUDGET = 2**28
+
+
+
+def get_block_size(n, sample_size, block_size=None, memory_budget=None, n_buffers=3, itemsize=8):
+    """Picks the number of probe vectors processed per block.
+
+    If block_size is given it is used as is (capped at sample_size). Otherwise the block width is the
+    largest one for which n_buffers arrays of shape (n, block_size) with the given itemsize fit in
+    memory_budget bytes (DEFAULT_MEMORY_BUDGET if not given).
+    """
+
+    if block_size is None:
+        if memory_budget is None:
+            memory_budget = DEFAULT_MEMORY_BUDGET
+        block_size = int(memory_budget // (n_buffers*n*itemsize))
+
+    block_size = max(1, min(block_size, sample_size))
+
+    return block_size
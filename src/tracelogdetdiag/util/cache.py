@@ -0,0 +1,61 @@
+import weakref
+from collections import OrderedDict
+
+
+
+class IdentityCache:
+    """A cache keyed by the identity of an object (e.g., a matrix or operator), plus an optional
+    user-provided key. Entries are dropped automatically when the object is garbage collected.
+
+    Since entries are keyed by identity, mutating a matrix in place does not invalidate its entries.
+    In that case pass a new key (e.g., a version counter) or clear the cache.
+
+    If max_bytes is given, the cache holds entries of at most max_bytes in total (as reported by the nbytes
+    passed to set), evicting the least recently used entries first.
+    """
+
+    def __init__(self, max_bytes=None):
+        self._entries = OrderedDict()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+
+    def get(self, obj, key=None, default=None):
+        cache_key = (id(obj), key)
+        entry = self._entries.get(cache_key)
+        if (entry is None) or (entry[0]() is not obj):
+            return default
+        self._entries.move_to_end(cache_key)
+        return entry[1]
+
+    def set(self, obj, value, key=None, nbytes=0):
+        if (self.max_bytes is not None) and (nbytes > self.max_bytes):
+            return
+        cache_key = (id(obj), key)
+        try:
+            ref = weakref.ref(obj, lambda _: self._pop(cache_key))
+        except TypeError:
+            # Object does not support weak references, don't cache
+            return
+        self._pop(cache_key)
+        self._entries[cache_key] = (ref, value, nbytes)
+        self.nbytes += nbytes
+        self.resize(self.max_bytes)
+
+    def resize(self, max_bytes):
+        """Sets max_bytes, evicting the least recently used entries until the cache fits."""
+        self.max_bytes = max_bytes
+        if max_bytes is not None:
+            while self.nbytes > max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
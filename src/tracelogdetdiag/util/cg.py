@@ -4,12 +4,58 @@ from .. import CUPY_INSTALLED
 if CUPY_INSTALLED:
     import cupy as cp
     from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
-    
-    
 
-def relative_resigual_cg(A, b, x0=None, eps=1e-8, maxits=1000):
+from .precision import ACCUMULATION_DTYPE, resolve_dtype, adjust_tolerance
+
+
+
+def _dot(x, y, xp, axis=None):
+    """Inner product(s) of x and y (over axis) accumulated in ACCUMULATION_DTYPE. Full inner products on the
+    host are returned as Python floats, so that they do not promote float32 arrays when used as scalars."""
+
+    if axis is None:
+        if x.dtype == ACCUMULATION_DTYPE:
+            result = x.T @ y
+        else:
+            result = xp.sum(x*y, dtype=ACCUMULATION_DTYPE)
+        return float(result) if xp is np else result
+
+    return xp.sum(x*y, axis=axis, dtype=ACCUMULATION_DTYPE)
+
+
+
+def _deflation_space(A, W, AW, dtype, xp):
+    """Returns W, A W and (W^T A W)^{-1} in dtype for the deflation space spanned by the columns of W."""
+
+    W = xp.asarray(W, dtype=dtype)
+    if AW is None:
+        AW = A @ W
+    AW = xp.asarray(AW, dtype=dtype)
+    WtAW = W.T.astype(ACCUMULATION_DTYPE) @ AW.astype(ACCUMULATION_DTYPE)
+    WtAW_inv = xp.linalg.inv((WtAW + WtAW.T)/2).astype(dtype)
+
+    return W, AW, WtAW_inv
+
+
+
+def relative_resigual_cg(A, b, x0=None, eps=1e-8, maxits=1000, refresh_every=None, M=None, dtype=None, W=None, AW=None):
     """Applies the conjugate gradient method for the solution of A x = b 
     until || A x - b  || / || b || < eps.
+
+    Uses one matvec with A per iteration. The stopping test uses the recursively updated residual;
+    if refresh_every is given, the residual is replaced by the true residual b - A x every refresh_every
+    iterations (at the cost of one extra matvec) to guard against drift. Does not raise if maxits is
+    reached; check the "converged" entry of the output instead.
+
+    If M is given, it should be a linear operator approximating A^{-1} and the preconditioned CG
+    method is used. The stopping test is still on the unpreconditioned residual.
+
+    The iterates are kept in the working dtype (see resolve_dtype) and eps is raised to what is attainable in it.
+
+    If W (n x k) is given, the deflated CG method of Saad et al. is used: the initial guess is corrected on
+    span(W) and the search directions are kept A-orthogonal to span(W), so that the part of the spectrum
+    captured by W (typically approximate eigenvectors for the smallest eigenvalues) no longer slows down
+    convergence. A W may be passed as AW to save k matvecs.
     """
     
     # Figure out shape
@@ -24,42 +70,234 @@ def relative_resigual_cg(A, b, x0=None, eps=1e-8, maxits=1000):
     else:
         xp = np
     
+    # Precision
+    dtype = resolve_dtype(A, dtype)
+    eps = adjust_tolerance(eps, dtype)
+    b = xp.asarray(b, dtype=dtype)
+
     # b norm
-    bnorm = xp.linalg.norm(b)
+    bnorm = xp.sqrt(_dot(b, b, xp))
     
     # Initialization
     if x0 is None:
-        x = xp.ones(n)
+        x = xp.ones(n, dtype=dtype)
     else:
-        x = x0
+        x = xp.array(x0, dtype=dtype)
+
+    if bnorm == 0:
+        x[:] = 0.0
+        data = {
+            "x": x,
+            "iterations": 0,
+            "converged": True,
+            "residual_norms": xp.zeros(1),
+        }
+        return data
     
-    converged = False
-    r = b - A.matvec(x)
-    d = r.copy()
+    r = b - (A @ x)
+    if W is not None:
+        W, AW, WtAW_inv = _deflation_space(A, W, AW, dtype, xp)
+        c = WtAW_inv @ (W.T @ r)
+        x += W @ c
+        r -= AW @ c
+    if M is None:
+        z = r
+    else:
+        z = xp.asarray(M @ r, dtype=dtype)
+    d = z.copy()
+    if W is not None:
+        d -= W @ (WtAW_inv @ (AW.T @ z))
+    tmp = xp.empty_like(r)
+    rr = _dot(r, r, xp)
+    rz = _dot(r, z, xp)
+    residual_norms = [xp.sqrt(rr)/bnorm]
+    converged = bool(residual_norms[-1] < eps)
     
     its = 0
     for j in range(maxits):
+
+        if converged:
+            break
         
-        alpha = (r.T @ r)/(d.T @ A.matvec(d) )
-        x = x + alpha*d
-        rnew = r - alpha * A.matvec( d )
-        beta = (rnew.T @ rnew)/(r.T @ r)
-        d = rnew + beta*d
-        r = rnew
-        
+        Ad = A @ d
+        alpha = rz/_dot(d, Ad, xp)
+        xp.multiply(d, alpha, out=tmp)
+        x += tmp
+        xp.multiply(Ad, alpha, out=tmp)
+        r -= tmp
         its += 1
-        residual_norm = xp.linalg.norm( b - A.matvec( x ) )
-        rel_residual_norm = residual_norm/bnorm
-        if rel_residual_norm < eps: 
-            converged = True
-            break
 
-    assert converged, "CG didn't converge in less than maxits iterations!"
+        # Optional true residual refresh
+        if (refresh_every is not None) and (its % refresh_every == 0):
+            r[:] = b - (A @ x)
+        
+        rr = _dot(r, r, xp)
+        if M is None:
+            rznew = rr
+        else:
+            z = xp.asarray(M @ r, dtype=dtype)
+            rznew = _dot(r, z, xp)
+        beta = rznew/rz
+        d *= beta
+        d += z
+        if W is not None:
+            d -= W @ (WtAW_inv @ (AW.T @ z))
+        rz = rznew
+        
+        residual_norms.append(xp.sqrt(rr)/bnorm)
+        converged = bool(residual_norms[-1] < eps)
         
     data = {
         "x": x,
         "iterations": its,
+        "converged": converged,
+        "residual_norms": xp.asarray(residual_norms),
     }
     
     return data
 
+
+
+def batched_relative_residual_cg(A, B, X0=None, eps=1e-8, maxits=1000, M=None, dtype=None, W=None, AW=None):
+    """Applies the conjugate gradient method to the solution of A X = B for all columns of B at once,
+    until || A x_j - b_j || / || b_j || < eps for every column j. The stopping test uses the recursively
+    updated residuals, and the per-column "converged" flags are returned rather than raising.
+
+    Each column keeps its own step sizes alpha and beta, but all columns that have not yet converged
+    are advanced together with a single matmat per iteration. Converged columns are masked out of
+    further iterations. If M is given, it should be a linear operator approximating A^{-1} and the
+    preconditioned CG method is used. As in relative_resigual_cg, the iterates are kept in dtype while
+    the per-column inner products are accumulated in float64. If W is given, every column is solved with
+    deflated CG on span(W), see relative_resigual_cg.
+    """
+
+    # Figure out shape
+    n = A.shape[0]
+    k = B.shape[1]
+    
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+    
+    # Precision
+    dtype = resolve_dtype(A, dtype)
+    eps = adjust_tolerance(eps, dtype)
+    B = xp.asarray(B, dtype=dtype)
+
+    # b norms
+    bnorms = xp.sqrt(_dot(B, B, xp, axis=0))
+
+    # Initialization
+    if X0 is None:
+        X = xp.ones((n, k), dtype=dtype)
+    else:
+        X = xp.array(X0, dtype=dtype)
+
+    R = B - (A @ X)
+    if W is not None:
+        W, AW, WtAW_inv = _deflation_space(A, W, AW, dtype, xp)
+        C = WtAW_inv @ (W.T @ R)
+        X += W @ C
+        R -= AW @ C
+    its = xp.zeros(k, dtype=int)
+
+    # Columns with b_j = 0 have the trivial solution
+    X[:,bnorms == 0] = 0.0
+
+    # Work on compact copies of the active columns, so that masking only costs a copy
+    # when some column converges
+    active = xp.flatnonzero(bnorms != 0)
+    Xa = X[:,active]
+    Ra = R[:,active]
+    if M is None:
+        Za = Ra
+    else:
+        Za = xp.asarray(M @ Ra, dtype=dtype)
+    Da = Za.copy()
+    if W is not None:
+        Da -= W @ (WtAW_inv @ (AW.T @ Za))
+    rza = _dot(Ra, Za, xp, axis=0)
+    bnormsa = bnorms[active]
+
+    for j in range(maxits):
+
+        if len(active) == 0:
+            break
+        
+        # One matmat for all active columns
+        ADa = A @ Da
+        alpha = (rza/_dot(Da, ADa, xp, axis=0)).astype(dtype)
+        Xa += alpha*Da
+        Ra -= alpha*ADa
+        if M is None:
+            Za = Ra
+        else:
+            Za = xp.asarray(M @ Ra, dtype=dtype)
+        rznew = _dot(Ra, Za, xp, axis=0)
+        beta = (rznew/rza).astype(dtype)
+        Da *= beta
+        Da += Za
+        if W is not None:
+            Da -= W @ (WtAW_inv @ (AW.T @ Za))
+        rza = rznew
+
+        its[active] += 1
+        rel_residual_norms = xp.sqrt(_dot(Ra, Ra, xp, axis=0))/bnormsa
+        keep = rel_residual_norms >= eps
+        if not xp.all(keep):
+            X[:,active[~keep]] = Xa[:,~keep]
+            active = active[keep]
+            Xa, Ra, Da = Xa[:,keep], Ra[:,keep], Da[:,keep]
+            rza, bnormsa = rza[keep], bnormsa[keep]
+
+    X[:,active] = Xa
+
+    converged = xp.ones(k, dtype=bool)
+    converged[active] = False
+
+    data = {
+        "x": X,
+        "iterations": its,
+        "converged": converged,
+    }
+
+    return data
+
+
+
+def ritz_deflation_space(A, X, k, U=None):
+    """Returns a basis U (n x k) of approximate eigenvectors for the k smallest eigenvalues of the SPD matrix A,
+    together with A U, the Ritz values and the Ritz residual norms || A u - theta u ||. These come from the
+    Rayleigh-Ritz procedure on span([U, X]), where U is a previous deflation space (if any) and X are, e.g.,
+    CG solutions A^{-1} b, which are rich in the eigenvectors for the smallest eigenvalues. Costs one matmat
+    with A on the (at most k + X.shape[1]) columns of the orthonormalized basis.
+    """
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    Z = X if U is None else xp.concatenate([U, X], axis=1)
+    Q, _ = xp.linalg.qr(Z)
+    AQ = A @ Q
+    H = Q.T @ AQ
+    thetas, S = xp.linalg.eigh((H + H.T)/2)
+
+    # Keep the k smallest Ritz pairs
+    S = S[:,:k]
+    thetas = thetas[:k]
+    U = Q @ S
+    AU = AQ @ S
+    residual_norms = xp.linalg.norm(AU - U*thetas, axis=0)
+
+    return U, AU, thetas, residual_norms
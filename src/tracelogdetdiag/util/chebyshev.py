@@ -0,0 +1,102 @@
+import numpy as np
+
+from .probes import draw_probes, spawn_rngs
+from .parallel import map_blocks
+from .precision import ACCUMULATION_DTYPE, resolve_dtype
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+
+def chebyshev_moments_block(A, V, lower, upper, degree, AV=None):
+    """Returns the moments mu_k = sum_v v^T T_k(A') v for k = 0, ..., degree over the columns v of V, where
+    A' = (2A - (upper + lower) I)/(upper - lower) maps the interval [lower, upper] to [-1,1].
+
+    The three-term recurrence T_{k+1}(A') V = 2 A' T_k(A') V - T_{k-1}(A') V is run in place on two buffers, so
+    the only allocation per degree is the product with A. If the product AV = A V is already known it is reused
+    for the first step, and degree - 1 matmats with A are done instead of degree. The moments are accumulated
+    in float64 on the host.
+    """
+
+    assert upper > lower, "upper must be larger than lower, see widen_spectral_bounds."
+
+    xp = cp if (CUPY_INSTALLED and not isinstance(V, np.ndarray)) else np
+    scale, shift = float(2/(upper - lower)), float((upper + lower)/(upper - lower))
+    moments = np.zeros(degree+1, dtype=ACCUMULATION_DTYPE)
+
+    moments[0] = float(xp.sum(V*V, dtype=ACCUMULATION_DTYPE))
+    if degree == 0:
+        return moments
+
+    # T_1(A') V
+    if AV is None:
+        AV = A @ V
+    W0 = V.copy()
+    W1 = scale*AV
+    W1 -= shift*V
+    moments[1] = float(xp.sum(V*W1, dtype=ACCUMULATION_DTYPE))
+
+    for k in range(2, degree+1):
+
+        # W0 <- 2 A' W1 - W0 = 2 scale A W1 - 2 shift W1 - W0
+        AW1 = A @ W1
+        W0 *= -1
+        AW1 *= 2*scale
+        W0 += AW1
+        W0 -= (2*shift)*W1
+        moments[k] = float(xp.sum(V*W0, dtype=ACCUMULATION_DTYPE))
+        W0, W1 = W1, W0
+
+    return moments
+
+
+
+def _chebyshev_moments_probe_block(A, n, method, lower, upper, degree, dtype, use_cupy, block_size, rng):
+    """Draws one block of probes and returns its Chebyshev moments, see chebyshev_moments_block."""
+
+    xp = cp if use_cupy else np
+    V = draw_probes(n, block_size, method=method, rng=rng, dtype=dtype, xp=xp)
+
+    return chebyshev_moments_block(A, V, lower, upper, degree)
+
+
+
+def stochastic_chebyshev_moments(A, lower, upper, degree, sample_size=100, block_size=20, method="rademacher", seed=None, n_workers=None, executor=None, backend="thread", dtype=None):
+    """Returns the averaged moments (1/sample_size) sum_v v^T T_k(A') v, k = 0, ..., degree, over sample_size
+    random probes v, where A' maps the interval [lower, upper] (which should contain the spectrum of the symmetric
+    matrix A) to [-1,1], see chebyshev_moments_block.
+
+    For any function f with Chebyshev coefficients c_k on [lower, upper], sum_k c_k mu_k is then an estimate of
+    tr(f(A)), so any number of functions can be evaluated from the same moments at no extra matvecs, see [7] and
+    trace_fun_stochastic_chebyshev_approx. Probes are drawn and processed in blocks as in hutchinson_trace.
+    """
+
+    # Get shape
+    n = A.shape[0]
+
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    # Handle blocks
+    n_blocks = int(np.ceil(sample_size/block_size))
+    rngs = spawn_rngs(seed, n_blocks)
+    dtype = resolve_dtype(A, dtype)
+
+    moments = np.zeros(degree+1, dtype=ACCUMULATION_DTYPE)
+    block_args = [ (min(block_size, sample_size - j*block_size), rngs[j]) for j in range(n_blocks) ]
+    for block_moments in map_blocks(_chebyshev_moments_probe_block, block_args, n_workers=n_workers, executor=executor, backend=backend, shared_args=(A, n, method, lower, upper, degree, dtype, xp is not np)):
+        moments += block_moments
+
+    return moments/sample_size
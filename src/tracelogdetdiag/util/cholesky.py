@@ -0,0 +1,185 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.linalg import cho_factor, cho_solve, cholesky_banded, cho_solve_banded
+from scipy.sparse.linalg import splu
+
+
+
+def get_bandwidth(A):
+    """Returns the (lower) bandwidth of the symmetric matrix A, i.e., the largest |i - j| with A[i,j] != 0."""
+
+    if sp.issparse(A):
+        A = A.tocoo()
+        rows, cols = A.row[A.data != 0], A.col[A.data != 0]
+    else:
+        rows, cols = np.nonzero(np.asarray(A))
+
+    if len(rows) == 0:
+        return 0
+
+    return int(np.max(np.abs(rows - cols)))
+
+
+
+def to_lower_banded(A, bandwidth=None):
+    """Returns the lower banded storage ab of the symmetric matrix A (dense or sparse) used by
+    scipy.linalg.cholesky_banded, i.e., ab[k, j] = A[j+k, j] for k = 0, ..., bandwidth."""
+
+    if bandwidth is None:
+        bandwidth = get_bandwidth(A)
+
+    n = A.shape[0]
+    ab = np.zeros((bandwidth+1, n))
+    for k in range(bandwidth+1):
+        if sp.issparse(A):
+            ab[k,:n-k] = A.diagonal(-k)
+        else:
+            ab[k,:n-k] = np.diagonal(A, -k)
+
+    return ab
+
+
+
+def dense_cholesky(A):
+    """Returns the dense Cholesky factor of A in the form used by scipy.linalg.cho_solve."""
+    return cho_factor(A.toarray() if sp.issparse(A) else A)
+
+
+
+def dense_cholesky_solve(chol, B):
+    """Solves A X = B given the output chol of dense_cholesky."""
+    return cho_solve(chol, B)
+
+
+
+def dense_cholesky_logdet(chol):
+    """Returns logdet(A) given the output chol of dense_cholesky."""
+    return 2*np.sum(np.log(np.diag(chol[0])))
+
+
+
+def banded_cholesky(A, bandwidth=None):
+    """Computes the Cholesky factor of the SPD banded matrix A (dense or sparse) in lower banded storage,
+    see to_lower_banded. Costs O(n b^2) for bandwidth b."""
+    return cholesky_banded(to_lower_banded(A, bandwidth=bandwidth), lower=True)
+
+
+
+def banded_cholesky_solve(cb, B):
+    """Solves A X = B given the banded Cholesky factor cb of A, see banded_cholesky."""
+    return cho_solve_banded((cb, True), B)
+
+
+
+def banded_cholesky_logdet(cb):
+    """Returns logdet(A) given the banded Cholesky factor cb of A, see banded_cholesky."""
+    return 2*np.sum(np.log(cb[0]))
+
+
+
+def banded_selected_inversion(cb):
+    """Computes diag(A^{-1}) from the banded Cholesky factor cb of A (see banded_cholesky) with the Takahashi
+    recurrences. Writing A = L D L^T with unit lower triangular L, the entries of Z = A^{-1} within the band satisfy
+
+        Z[j,i] = - sum_{k > i} L[k,i] Z[j,k] (j > i),   Z[i,i] = 1/D[i] - sum_{k > i} L[k,i] Z[k,i],
+
+    which only involve entries of Z within the band. Sweeping i from n-1 down to 0 with a window of the
+    trailing (b+1) x (b+1) block of Z costs O(n b^2), instead of the n triangular solves of an explicit probe.
+    """
+
+    bandwidth = cb.shape[0] - 1
+    n = cb.shape[1]
+    diagonal_inv = np.zeros(n)
+
+    # Window Z[i:i+b+1, i:i+b+1] (truncated at the end of the matrix)
+    window = np.zeros((0, 0))
+    for i in range(n-1, -1, -1):
+
+        m = min(bandwidth, n-1-i)
+        l = cb[1:m+1,i]/cb[0,i]
+        Z_trailing = window[:m,:m]
+
+        z = -(Z_trailing @ l)
+        zii = 1.0/(cb[0,i]**2) - l @ z
+        diagonal_inv[i] = zii
+
+        # Shift the window
+        window = np.empty((m+1, m+1))
+        window[0,0] = zii
+        window[1:,0] = z
+        window[0,1:] = z
+        window[1:,1:] = Z_trailing
+
+    return diagonal_inv
+
+
+
+def sparse_cholesky(A):
+    """Computes a sparse LDL^T factorization P^T A P = L D L^T of the SPD sparse matrix A with a fill-reducing
+    (minimum degree on A + A^T) ordering P. This uses the SuperLU factorization of scipy.sparse with symmetric
+    mode and diagonal pivoting, so that U = D L^T, and returns the SuperLU object."""
+
+    lu = splu(sp.csc_matrix(A), permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0, options=dict(SymmetricMode=True))
+    assert np.all(lu.perm_r == lu.perm_c), "Sparse LU did not pivot symmetrically, A must be SPD."
+
+    return lu
+
+
+
+def sparse_cholesky_solve(lu, B):
+    """Solves A X = B given the output lu of sparse_cholesky."""
+    return lu.solve(B)
+
+
+
+def sparse_cholesky_logdet(lu):
+    """Returns logdet(A) given the output lu of sparse_cholesky."""
+    return np.sum(np.log(lu.U.diagonal()))
+
+
+
+def sparse_selected_inversion(lu):
+    """Computes diag(A^{-1}) from the sparse factorization lu of A (see sparse_cholesky) with the Takahashi
+    recurrences of banded_selected_inversion, restricted to the sparsity pattern of the factor L. Since the
+    pattern of L is closed under the recurrence, no entries of A^{-1} outside of it are needed. The cost is
+    sum_i |L[:,i]|^2, i.e., proportional to the fill of the factorization rather than to n^3.
+    """
+
+    n = lu.shape[0]
+    L = sp.csc_matrix(lu.L)
+    L.sort_indices()
+    D = lu.U.diagonal()
+
+    # Strictly lower triangle of Z = (P^T A P)^{-1} on the pattern of L, in the same layout as L.data
+    Z_data = np.zeros(len(L.data))
+    diagonal_inv = np.zeros(n)
+    for i in range(n-1, -1, -1):
+
+        start, end = L.indptr[i], L.indptr[i+1]
+        below = start + np.flatnonzero(L.indices[start:end] > i)
+        rows, l = L.indices[below], L.data[below]
+
+        # Trailing block Z[rows, rows], gathered from the stored columns of Z
+        m = len(rows)
+        Z_trailing = np.empty((m, m))
+        for a in range(m):
+            col_start, col_end = L.indptr[rows[a]], L.indptr[rows[a]+1]
+            idx = col_start + np.searchsorted(L.indices[col_start:col_end], rows[a+1:])
+            Z_trailing[a,a] = diagonal_inv[rows[a]]
+            Z_trailing[a+1:,a] = Z_trailing[a,a+1:] = Z_data[idx]
+
+        z = -(Z_trailing @ l)
+        Z_data[below] = z
+        diagonal_inv[i] = 1.0/D[i] - l @ z
+
+    # Undo the ordering, (P^T A P)[perm_c[i], perm_c[i]] = A[i,i]
+    return diagonal_inv[lu.perm_c]
+
+
+
+# Factorization, solve and logdet for each Cholesky backend
+CHOLESKY_BACKENDS = {
+    "cholesky": (dense_cholesky, dense_cholesky_solve, dense_cholesky_logdet),
+    "banded_cholesky": (banded_cholesky, banded_cholesky_solve, banded_cholesky_logdet),
+    "sparse_cholesky": (sparse_cholesky, sparse_cholesky_solve, sparse_cholesky_logdet),
+}
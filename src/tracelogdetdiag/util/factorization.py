@@ -0,0 +1,123 @@
+import numpy as np
+from scipy.linalg import solve_triangular
+
+from .cache import IdentityCache
+from .cholesky import CHOLESKY_BACKENDS, banded_cholesky, banded_selected_inversion, sparse_selected_inversion
+
+
+DEFAULT_FACTORIZATION_CACHE_BYTES = 2**30
+
+_FACTORIZATION_CACHE = IdentityCache(max_bytes=DEFAULT_FACTORIZATION_CACHE_BYTES)
+
+
+
+class Factorization:
+    """A Cholesky factorization of the SPD matrix A with one of the backends in CHOLESKY_BACKENDS ("cholesky",
+    "banded_cholesky" or "sparse_cholesky"), which can be shared between the estimators that need one, e.g.
+    logdet_via_cholesky, explicit_diaginv_probe, naive_diaginv and traceinv_via_cholesky. Derived quantities
+    (logdet, diag(A^{-1})) are computed once and kept on the object.
+
+    Use factorize to get a (cached) factorization for A.
+    """
+
+    def __init__(self, A, method="cholesky", bandwidth=None):
+
+        valid_methods = list(CHOLESKY_BACKENDS.keys())
+        assert method in valid_methods, f"method must be one of {valid_methods}"
+
+        # Bind
+        self.method = method
+        self.shape = A.shape
+        self._solve_fn = CHOLESKY_BACKENDS[method][1]
+        self._logdet_fn = CHOLESKY_BACKENDS[method][2]
+        self._logdet = None
+        self._diaginv = None
+
+        # Factor
+        if method == "banded_cholesky":
+            self.factor = banded_cholesky(A, bandwidth=bandwidth)
+        else:
+            self.factor = CHOLESKY_BACKENDS[method][0](A)
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the factor, in bytes."""
+        if self.method == "cholesky":
+            return self.factor[0].nbytes
+        elif self.method == "banded_cholesky":
+            return self.factor.nbytes
+        else:
+            return self.factor.nnz*(8 + 4) + 2*self.shape[0]*4
+
+    def solve(self, B):
+        """Returns A^{-1} B."""
+        return self._solve_fn(self.factor, B)
+
+    def logdet(self):
+        """Returns logdet(A)."""
+        if self._logdet is None:
+            self._logdet = self._logdet_fn(self.factor)
+        return self._logdet
+
+    def diaginv(self):
+        """Returns diag(A^{-1}). For the banded and sparse backends this uses selected inversion, see
+        banded_selected_inversion and sparse_selected_inversion, and for the dense backend the row norms of
+        the inverse Cholesky factor."""
+
+        if self._diaginv is None:
+            if self.method == "cholesky":
+                chol, lower = self.factor
+                chol_inv = solve_triangular(chol, np.eye(self.shape[0]), lower=lower)
+                axis = 0 if lower else 1
+                self._diaginv = np.sum(chol_inv**2, axis=axis)
+            elif self.method == "banded_cholesky":
+                self._diaginv = banded_selected_inversion(self.factor)
+            else:
+                self._diaginv = sparse_selected_inversion(self.factor)
+
+        return self._diaginv
+
+    def traceinv(self):
+        """Returns tr(A^{-1})."""
+        return np.sum(self.diaginv())
+
+
+
+def factorize(A, method="cholesky", bandwidth=None, cache=None, key=None):
+    """Returns a Factorization of A with the given method. If cache=True, factorizations are cached per operator
+    identity, key and bandwidth, so that repeated calls on the same A, e.g. by logdet_via_cholesky and naive_diaginv,
+    factor it only once. The cache holds at most DEFAULT_FACTORIZATION_CACHE_BYTES of factors, evicting the least
+    recently used ones (see set_factorization_cache_size).
+
+    By default (cache=None) a factorization is only cached if a key is given. Since the cache cannot see in-place
+    modifications of A, the key should identify the current values of A, e.g. a version counter that is bumped
+    whenever A changes.
+    """
+
+    if cache is None:
+        cache = key is not None
+
+    cache_key = (method, bandwidth, key)
+    if cache:
+        factorization = _FACTORIZATION_CACHE.get(A, key=cache_key)
+        if factorization is not None:
+            return factorization
+
+    factorization = Factorization(A, method=method, bandwidth=bandwidth)
+
+    if cache:
+        _FACTORIZATION_CACHE.set(A, factorization, key=cache_key, nbytes=factorization.nbytes)
+
+    return factorization
+
+
+
+def set_factorization_cache_size(max_bytes):
+    """Sets the maximum total size in bytes of the factorizations cached by factorize (None for no limit)."""
+    _FACTORIZATION_CACHE.resize(max_bytes)
+
+
+
+def clear_factorization_cache():
+    """Clears the cache used by factorize."""
+    _FACTORIZATION_CACHE.clear()
@@ -0,0 +1,103 @@
+import numpy as np
+from scipy.linalg import eigh_tridiagonal
+
+from .precision import ACCUMULATION_DTYPE
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+
+def lanczos_quadrature(alphas, betas, f):
+    """Computes the Gauss quadrature estimate e_1^T f(T) e_1, where T is the symmetric tridiagonal
+    Lanczos matrix with diagonal alphas and off-diagonal betas.
+    """
+
+    thetas, S = eigh_tridiagonal(alphas, betas)
+
+    return np.sum( (S[0,:]**2) * f(thetas) )
+
+
+
+def batched_lanczos(A, V, maxits=50, f=None, tol=None):
+    """Runs the Lanczos process on each column of V at once, using one matmat with A per iteration
+    for all columns that are still active. A must be symmetric.
+
+    A column stops early if its Krylov space becomes invariant, or, if a function f and tolerance tol
+    are given, once its Lanczos quadrature estimate of v^T f(A) v changes by less than tol (relative)
+    between two consecutive iterations. No reorthogonalization is done.
+
+    The Lanczos vectors keep the dtype of V, while the coefficients alpha are accumulated in float64.
+    """
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    # Shapes
+    k = V.shape[1]
+    alphas = np.zeros((maxits, k))
+    betas = np.zeros((maxits, k))
+    its = np.zeros(k, dtype=int)
+    quad_estimates = np.zeros(k)
+
+    # Initialization
+    norms = xp.linalg.norm(V, axis=0)
+    active = np.arange(k)
+    Q = V/norms
+    Q_prev = xp.zeros_like(Q)
+    beta_prev = xp.zeros(k, dtype=Q.dtype)
+    vnorms_sq = norms**2
+    if xp != np:
+        vnorms_sq = cp.asnumpy(vnorms_sq)
+
+    for j in range(maxits):
+
+        if len(active) == 0:
+            break
+
+        # One matmat for all active columns
+        W = A @ Q
+        W -= beta_prev*Q_prev
+        alpha = xp.sum(Q*W, axis=0, dtype=ACCUMULATION_DTYPE)
+        W -= alpha.astype(W.dtype)*Q
+        beta = xp.linalg.norm(W, axis=0)
+
+        # Record coefficients on the host
+        if xp == np:
+            alphas[j,active], betas[j,active] = alpha, beta
+        else:
+            alphas[j,active], betas[j,active] = cp.asnumpy(alpha), cp.asnumpy(beta)
+        its[active] += 1
+
+        # Check which columns are finished
+        keep = betas[j,active] > 1e-12*np.abs(alphas[j,active]).max()
+        if f is not None:
+            for idx, col in enumerate(active):
+                quad_estimate = vnorms_sq[col]*lanczos_quadrature(alphas[:j+1,col], betas[:j,col], f)
+                if (tol is not None) and (j > 0) and (abs(quad_estimate - quad_estimates[col]) <= tol*abs(quad_estimate)):
+                    keep[idx] = False
+                quad_estimates[col] = quad_estimate
+
+        # Next Lanczos vectors
+        keep_xp = xp.asarray(keep)
+        Q_prev = Q[:,keep_xp]
+        beta_prev = beta[keep_xp]
+        Q = W[:,keep_xp]/beta_prev
+        active = active[keep]
+
+    data = {
+        "alphas": alphas,
+        "betas": betas,
+        "iterations": its,
+        "quadrature_estimates": quad_estimates,
+    }
+
+    return data
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import LinearOperator
+
+from .blocks import DEFAULT_MEMORY_BUDGET
+
+
+
+class MemmapLinearOperator(LinearOperator):
+    """Subclass of LinearOperator for a dense matrix A that is stored on disk, e.g. as a np.memmap or a .npy file
+    (which is opened with mmap_mode="r"). Products with A are computed by streaming A in blocks of rows_per_chunk
+    rows, so only one chunk of A is held in memory at a time. If rows_per_chunk is not given, it is picked so that
+    a chunk takes at most memory_budget bytes (DEFAULT_MEMORY_BUDGET if not given).
+
+    Every product streams all of A from disk, so the probe-based estimators should use block sizes as large as
+    the memory for the probes allows. If A is symmetric, pass symmetric=True so that products with A^T reuse the
+    row-wise pass instead of accumulating A^T X chunk by chunk.
+    """
+
+    def __init__(self, A, rows_per_chunk=None, memory_budget=None, symmetric=False):
+
+        if isinstance(A, (str, os.PathLike)):
+            A = np.load(A, mmap_mode="r")
+        assert A.ndim == 2, "A must be two-dimensional."
+
+        # Bind
+        self.A = A
+        self.symmetric = symmetric
+        if rows_per_chunk is None:
+            if memory_budget is None:
+                memory_budget = DEFAULT_MEMORY_BUDGET
+            rows_per_chunk = int(memory_budget // (A.shape[1]*A.dtype.itemsize))
+        self.rows_per_chunk = max(1, min(rows_per_chunk, A.shape[0]))
+
+        # Super
+        super().__init__(A.dtype, A.shape)
+
+    def _chunks(self):
+        for start in range(0, self.shape[0], self.rows_per_chunk):
+            stop = min(start + self.rows_per_chunk, self.shape[0])
+            yield start, stop, np.asarray(self.A[start:stop])
+
+    def _matmat(self, X):
+        out = np.empty((self.shape[0], X.shape[1]), dtype=np.result_type(self.dtype, X.dtype))
+        for start, stop, chunk in self._chunks():
+            np.matmul(chunk, X, out=out[start:stop])
+        return out
+
+    def _matvec(self, x):
+        return self._matmat(x.reshape(-1, 1)).reshape(-1)
+
+    def _rmatmat(self, X):
+        if self.symmetric:
+            return self._matmat(X)
+        out = np.zeros((self.shape[1], X.shape[1]), dtype=np.result_type(self.dtype, X.dtype))
+        for start, stop, chunk in self._chunks():
+            out += chunk.T @ X[start:stop]
+        return out
+
+    def _rmatvec(self, x):
+        return self._rmatmat(x.reshape(-1, 1)).reshape(-1)
+
+    def diagonal(self):
+        """Returns the diagonal of A, reading only the diagonal blocks of each chunk."""
+        diagonal = np.empty(min(self.shape), dtype=self.dtype)
+        for start in range(0, len(diagonal), self.rows_per_chunk):
+            stop = min(start + self.rows_per_chunk, len(diagonal))
+            diagonal[start:stop] = np.diagonal(self.A[start:stop, start:stop])
+        return diagonal
+
+
+
+class ShardedCSRLinearOperator(LinearOperator):
+    """Subclass of LinearOperator for a sparse matrix A stored on disk as consecutive row blocks, each saved
+    as a CSR matrix with scipy.sparse.save_npz (see write_csr_shards). Products with A load one shard at a time,
+    so only one shard of A is held in memory at a time. As for MemmapLinearOperator, pass symmetric=True if A
+    is symmetric so that products with A^T reuse the row-wise pass.
+    """
+
+    def __init__(self, shards, symmetric=False):
+
+        assert len(shards) > 0, "At least one shard is required."
+
+        # Read the shard shapes without loading the shards
+        shard_rows = []
+        n_cols = None
+        for shard in shards:
+            with np.load(shard) as f:
+                shard_shape = tuple(int(s) for s in f["shape"])
+            assert (n_cols is None) or (shard_shape[1] == n_cols), "All shards must have the same number of columns."
+            n_cols = shard_shape[1]
+            shard_rows.append(shard_shape[0])
+
+        # Bind
+        self.shards = list(shards)
+        self.symmetric = symmetric
+        self.offsets = np.concatenate([[0], np.cumsum(shard_rows)])
+        dtype = sp.load_npz(self.shards[0]).dtype
+
+        # Super
+        super().__init__(dtype, (int(self.offsets[-1]), n_cols))
+
+    def _chunks(self):
+        for j, shard in enumerate(self.shards):
+            yield self.offsets[j], self.offsets[j+1], sp.load_npz(shard).tocsr()
+
+    def _matmat(self, X):
+        out = np.empty((self.shape[0], X.shape[1]), dtype=np.result_type(self.dtype, X.dtype))
+        for start, stop, chunk in self._chunks():
+            out[start:stop] = chunk @ X
+        return out
+
+    def _matvec(self, x):
+        return self._matmat(x.reshape(-1, 1)).reshape(-1)
+
+    def _rmatmat(self, X):
+        if self.symmetric:
+            return self._matmat(X)
+        out = np.zeros((self.shape[1], X.shape[1]), dtype=np.result_type(self.dtype, X.dtype))
+        for start, stop, chunk in self._chunks():
+            out += chunk.T @ X[start:stop]
+        return out
+
+    def _rmatvec(self, x):
+        return self._rmatmat(x.reshape(-1, 1)).reshape(-1)
+
+    def diagonal(self):
+        """Returns the diagonal of A, loading one shard at a time."""
+        diagonal = np.zeros(min(self.shape), dtype=self.dtype)
+        for start, stop, chunk in self._chunks():
+            stop = min(stop, len(diagonal))
+            if start < stop:
+                diagonal[start:stop] = chunk[:stop-start, start:stop].diagonal()
+        return diagonal
+
+
+
+def write_csr_shards(A, prefix, rows_per_shard):
+    """Writes the rows of A (a sparse matrix or anything that supports row slicing, e.g. a np.memmap) as
+    CSR shards of rows_per_shard rows to prefix_00000.npz, prefix_00001.npz, ..., and returns the list of paths,
+    which can be passed to ShardedCSRLinearOperator."""
+
+    paths = []
+    for j, start in enumerate(range(0, A.shape[0], rows_per_shard)):
+        path = f"{prefix}_{j:05d}.npz"
+        sp.save_npz(path, sp.csr_matrix(A[start:start+rows_per_shard]))
+        paths.append(path)
+
+    return paths
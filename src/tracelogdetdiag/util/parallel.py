@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+
+# Arguments shared by all blocks, set once per worker process of the pools created by map_blocks
+_WORKER_SHARED_ARGS = ()
+
+
+
+def _init_worker(shared_args):
+    global _WORKER_SHARED_ARGS
+    _WORKER_SHARED_ARGS = shared_args
+
+
+
+def _call_with_worker_shared_args(fn, *args):
+    return fn(*_WORKER_SHARED_ARGS, *args)
+
+
+
+def map_blocks(fn, args_list, n_workers=None, executor=None, backend="thread", shared_args=()):
+    """Yields fn(*shared_args, *args) for args in args_list, possibly evaluated in parallel. Results are always
+    yielded in the order of args_list, so reductions over them are deterministic. When evaluated serially, each
+    result is only computed when requested, so a running reduction keeps just one block in memory.
+
+    If executor (a concurrent.futures.Executor) is given it is used. Otherwise, if n_workers > 1, a temporary
+    thread pool (backend="thread", for operators whose products release the GIL, e.g. SciPy sparse or BLAS) or
+    process pool (backend="process", for pure-Python operators; fn and its arguments must be picklable) with 
+    n_workers workers is used. Otherwise the blocks are evaluated serially.
+
+    Since each block gets its own arguments (e.g. its own random stream, see spawn_rngs), the results do not
+    depend on n_workers or on the order in which the blocks are evaluated, as long as fn has no side effects on
+    shared_args. Operators whose products depend on earlier products (those with a true stateful attribute, e.g.
+    an AinvCGLinearOperator with use_prev=True or recycle_k > 0) would be mutated concurrently by a thread pool,
+    or diverge between worker processes, so they can only be evaluated serially.
+
+    shared_args holds the arguments common to all blocks, e.g. the operator A. A process pool created here
+    receives them once per worker (through its initializer) rather than once per block, so large operators are
+    only pickled n_workers times. With a user-supplied process executor they are sent with every block.
+    """
+
+    valid_backends = ["thread", "process"]
+    assert backend in valid_backends, f"backend must be one of {valid_backends}"
+
+    if len(args_list) == 0:
+        return
+
+    parallel = (executor is not None) or ((n_workers is not None) and (n_workers > 1))
+    assert not (parallel and any(getattr(arg, "stateful", False) for arg in shared_args)), "Stateful operators cannot be evaluated in parallel, use n_workers=None."
+
+    if executor is not None:
+        yield from executor.map(partial(fn, *shared_args), *zip(*args_list))
+        return
+
+    if (n_workers is None) or (n_workers <= 1):
+        for args in args_list:
+            yield fn(*shared_args, *args)
+        return
+
+    if backend == "thread":
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            yield from pool.map(partial(fn, *shared_args), *zip(*args_list))
+    elif backend == "process":
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(shared_args,)) as pool:
+            yield from pool.map(partial(_call_with_worker_shared_args, fn), *zip(*args_list))
+    else:
+        raise NotImplementedError
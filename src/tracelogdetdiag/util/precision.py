@@ -0,0 +1,32 @@
+import numpy as np
+
+
+# Block sums, Chebyshev moments and CG scalars are always accumulated in this dtype
+ACCUMULATION_DTYPE = np.float64
+
+
+
+def resolve_dtype(A, dtype=None):
+    """Returns the working dtype for probes and matvecs with A. This is dtype if given, otherwise float32 if A
+    has dtype float32 and float64 in all other cases.
+
+    The estimators take a dtype argument resolved with this function. Probes, matvecs and Krylov vectors use the
+    working dtype, while block sums, moments, Chebyshev coefficients and quadrature are accumulated in
+    ACCUMULATION_DTYPE, so float32 halves the memory traffic of the matvecs without losing the sums."""
+
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        assert dtype in (np.float32, np.float64), "dtype must be float32 or float64."
+        return dtype
+
+    if getattr(A, "dtype", None) == np.float32:
+        return np.dtype(np.float32)
+
+    return np.dtype(np.float64)
+
+
+
+def adjust_tolerance(tol, dtype):
+    """Raises the relative tolerance tol to what is attainable in the working dtype (10 machine epsilons)."""
+
+    return max(tol, 10*np.finfo(dtype).eps)
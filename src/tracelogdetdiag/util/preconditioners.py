@@ -0,0 +1,110 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import LinearOperator, spsolve_triangular
+
+
+
+def jacobi_preconditioner(A):
+    """Returns the Jacobi preconditioner diag(A)^{-1} as a LinearOperator. A must be a dense or
+    sparse matrix with a positive diagonal.
+    """
+
+    # Get diagonal
+    if sp.issparse(A):
+        diagonal = np.asarray(A.diagonal(), dtype=float)
+    else:
+        diagonal = np.diag(np.asarray(A)).astype(float)
+
+    assert np.all(diagonal > 0), "A must have a positive diagonal."
+    diagonal_inv = 1.0/diagonal
+
+    def _apply(x):
+        return (diagonal_inv*x.T).T
+
+    M = LinearOperator(A.shape, matvec=_apply, rmatvec=_apply, matmat=_apply, rmatmat=_apply, dtype=diagonal_inv.dtype)
+
+    return M
+
+
+
+def incomplete_cholesky(A, shift=0.0, max_shift_tries=10):
+    """Computes the zero fill-in incomplete Cholesky factor L of a sparse SPD matrix A, i.e., a lower
+    triangular L with the sparsity pattern of tril(A) such that L L^T \approx A.
+
+    IC(0) can break down (non-positive pivot) even for SPD A. In that case the factorization is
+    retried on A + shift*diag(A) with an increasing shift, as suggested by Manteuffel.
+    """
+
+    A = sp.csr_matrix(A, dtype=float)
+    n = A.shape[0]
+    A_lower = sp.tril(A, format="csr")
+    A_lower.sort_indices()
+    diagonal = A.diagonal()
+
+    for _ in range(max_shift_tries+1):
+
+        rows = []
+        breakdown = False
+        for i in range(n):
+
+            # Pattern and values of row i of tril(A)
+            start, end = A_lower.indptr[i], A_lower.indptr[i+1]
+            cols = A_lower.indices[start:end]
+            vals = A_lower.data[start:end].copy()
+            row = {}
+
+            for idx, j in enumerate(cols):
+
+                # Subtract the contribution of L[i,:j] L[j,:j]^T, restricted to the pattern
+                s = vals[idx]
+                if j < i:
+                    row_j = rows[j]
+                    for k, ljk in row_j.items():
+                        if (k < j) and (k in row):
+                            s -= row[k]*ljk
+                    row[j] = s/row_j[j]
+                else:
+                    s += shift*diagonal[i]
+                    for k, lik in row.items():
+                        s -= lik*lik
+                    if s <= 0:
+                        breakdown = True
+                        break
+                    row[i] = np.sqrt(s)
+
+            if breakdown:
+                break
+            rows.append(row)
+
+        if not breakdown:
+            break
+
+        shift = max(2*shift, 1e-3)
+
+    assert not breakdown, "Incomplete Cholesky broke down, even with a diagonal shift."
+
+    # Assemble L
+    indptr = np.cumsum([0] + [len(row) for row in rows])
+    indices = np.fromiter((k for row in rows for k in sorted(row)), dtype=int, count=indptr[-1])
+    data = np.fromiter((row[k] for row in rows for k in sorted(row)), dtype=float, count=indptr[-1])
+    L = sp.csr_matrix((data, indices, indptr), shape=(n, n))
+
+    return L
+
+
+
+def incomplete_cholesky_preconditioner(A, shift=0.0):
+    """Returns the incomplete Cholesky preconditioner (L L^T)^{-1} as a LinearOperator, where L is the
+    IC(0) factor of the sparse SPD matrix A.
+    """
+
+    L = incomplete_cholesky(A, shift=shift)
+    Lt = L.T.tocsr()
+
+    def _apply(x):
+        y = spsolve_triangular(L, x, lower=True)
+        return spsolve_triangular(Lt, y, lower=False)
+
+    M = LinearOperator(A.shape, matvec=_apply, rmatvec=_apply, matmat=_apply, rmatmat=_apply, dtype=L.dtype)
+
+    return M
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .spectral_bounds import spectral_bounds, widen_spectral_bounds
+from .probes import draw_probes, get_seed_sequence
+from .precision import ACCUMULATION_DTYPE, resolve_dtype
+from .chebyshev import chebyshev_moments_block
+from ..logdet.util import get_interval_chebyshev_coeffs
+from ..logdet.stochastic_lanczos import SPECTRAL_FUNCTIONS
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+
+class ProbeSession:
+    """Owns a fixed panel of sample_size random probe vectors V for the operator A (split into blocks of
+    block_size columns) and shares the products with A between estimators, so that e.g. tr(A), diag(A)
+    and logdet(A) can be computed jointly from the same matvecs.
+
+    Each block of probes is regenerated on demand from its own seed. The images A V of the blocks are kept
+    in an LRU cache holding at most max_cached_bytes; evicted blocks are recomputed when needed again. Chebyshev
+    moments sum_v v^T T_k(A') v (A' being A mapped from an interval to [-1,1]) are cached per interval and
+    degree, so any number of spectral functions on that interval can be evaluated without further matvecs.
+    The number of matvecs with A done so far is tracked in self.n_matvecs. Probes and matvecs use the working dtype,
+    see resolve_dtype.
+    """
+
+    def __init__(self, A, sample_size=100, block_size=20, method="rademacher", seed=None, max_cached_bytes=2**28, dtype=None):
+
+        valid_methods = ["standard_gaussian", "rademacher"]
+        assert method in valid_methods, f"method must be one of {valid_methods}"
+
+        # Bind
+        self.A = A
+        self.n = A.shape[0]
+        self.sample_size = sample_size
+        self.block_size = block_size
+        self.method = method
+        self.dtype = resolve_dtype(A, dtype)
+        self.max_cached_bytes = max_cached_bytes
+        self.n_blocks = int(np.ceil(sample_size/block_size))
+        self.n_matvecs = 0
+
+        # Handle CuPy
+        if CUPY_INSTALLED:
+            if isinstance(A, CuPyLinearOperator):
+                self.xp = cp
+            else:
+                self.xp = np
+        else:
+            self.xp = np
+
+        # One seed per block, so blocks can be regenerated independently, and one for the spectral bounds
+        seed_seq = get_seed_sequence(seed)
+        self._block_seeds = seed_seq.spawn(self.n_blocks)
+        self._bounds_seed = seed_seq.spawn(1)[0]
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._moments = {}
+        self._bounds = None
+
+    def block_probes(self, j):
+        """Returns the jth block of probe vectors."""
+        curr_block_size = min(self.block_size, self.sample_size - j*self.block_size)
+        rng = np.random.default_rng(self._block_seeds[j])
+        return draw_probes(self.n, curr_block_size, method=self.method, rng=rng, dtype=self.dtype, xp=self.xp)
+
+    def block_image(self, j, V=None):
+        """Returns A V for the jth block of probe vectors V, from the cache if possible."""
+
+        if j in self._cache:
+            self._cache.move_to_end(j)
+            return self._cache[j]
+
+        if V is None:
+            V = self.block_probes(j)
+        AV = self.A @ V
+        self.n_matvecs += V.shape[1]
+
+        # Cache, evicting the least recently used blocks
+        if AV.nbytes <= self.max_cached_bytes:
+            while self._cached_bytes + AV.nbytes > self.max_cached_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted.nbytes
+            self._cache[j] = AV
+            self._cached_bytes += AV.nbytes
+
+        return AV
+
+    def clear_cache(self):
+        """Drops all cached images, moments and spectral bounds."""
+        self._cache.clear()
+        self._cached_bytes = 0
+        self._moments.clear()
+        self._bounds = None
+
+    def trace(self):
+        """Hutchinson estimate of tr(A) from the session probes."""
+        xp = self.xp
+        tot_sum = 0.0
+        for j in range(self.n_blocks):
+            V = self.block_probes(j)
+            tot_sum += float(xp.sum(V * self.block_image(j, V), dtype=ACCUMULATION_DTYPE))
+        return tot_sum/self.sample_size
+
+    def diag(self):
+        """Estimate of diag(A) from the session probes, see [5]."""
+        xp = self.xp
+        tk = xp.zeros(self.n, dtype=ACCUMULATION_DTYPE)
+        qk = xp.zeros(self.n, dtype=ACCUMULATION_DTYPE)
+        for j in range(self.n_blocks):
+            V = self.block_probes(j)
+            tk += xp.sum(V * self.block_image(j, V), axis=1, dtype=ACCUMULATION_DTYPE)
+            qk += xp.sum(V * V, axis=1, dtype=ACCUMULATION_DTYPE)
+        return tk/qk
+
+    def chebyshev_moments(self, lower, upper, degree):
+        """Returns the moments mu_k = sum_v v^T T_k(A') v for k = 0, ..., degree, summed over all session probes,
+        where A' = (2A - (upper + lower) I)/(upper - lower), see chebyshev_moments_block. The first Chebyshev step
+        reuses the cached A V."""
+
+        # Reuse moments of at least the requested degree
+        for (l, u, d), moments in self._moments.items():
+            if (l == lower) and (u == upper) and (d >= degree):
+                return moments[:degree+1]
+
+        moments = np.zeros(degree+1, dtype=ACCUMULATION_DTYPE)
+        for j in range(self.n_blocks):
+
+            V = self.block_probes(j)
+            AV = self.block_image(j, V) if degree > 0 else None
+            moments += chebyshev_moments_block(self.A, V, lower, upper, degree, AV=AV)
+            self.n_matvecs += V.shape[1]*max(degree - 1, 0)
+
+        self._moments[(lower, upper, degree)] = moments
+
+        return moments
+
+    def trace_fun(self, f, sigma_min=None, sigma_max=None, chebyshev_n=14, damping=None):
+        """Stochastic Chebyshev estimate of tr(f(A)) for symmetric A, see [7], from the session probes. f is a
+        vectorized function or one of the keys of SPECTRAL_FUNCTIONS. If the spectral interval [sigma_min, sigma_max]
+        is not given it is estimated once per session with spectral_bounds (the lower end is only an estimate unless
+        A is an explicit matrix with a positive Gershgorin bound, pass sigma_min if one is known). The expansion may be damped, see chebyshev_damping_factors.
+        Further functions on the same interval and degree cost no matvecs, see chebyshev_moments."""
+
+        if isinstance(f, str):
+            assert f in SPECTRAL_FUNCTIONS.keys(), f"f must be a callable or one of {list(SPECTRAL_FUNCTIONS.keys())}"
+            f = SPECTRAL_FUNCTIONS[f]
+
+        if (sigma_min is None) or (sigma_max is None):
+            if self._bounds is None:
+                self._bounds = spectral_bounds(self.A, seed=self._bounds_seed)
+            lower, upper = self._bounds
+            if sigma_min is None:
+                sigma_min = lower
+            if sigma_max is None:
+                sigma_max = upper
+        sigma_min, sigma_max = widen_spectral_bounds(sigma_min, sigma_max)
+
+        # (Cached) Chebyshev coefficients of f on [sigma_min, sigma_max]
+        chebyshev_coeffs = get_interval_chebyshev_coeffs(f, sigma_min, sigma_max, chebyshev_n, damping=damping)
+
+        moments = self.chebyshev_moments(sigma_min, sigma_max, chebyshev_n)
+
+        return np.dot(chebyshev_coeffs, moments)/self.sample_size
+
+    def logdet(self, sigma_min=None, sigma_max=None, chebyshev_n=14, damping=None):
+        """Stochastic Chebyshev estimate of logdet(A) for SPD A, see [7] and trace_fun."""
+        return self.trace_fun(np.log, sigma_min=sigma_min, sigma_max=sigma_max, chebyshev_n=chebyshev_n, damping=damping)
+
+    def traceinv(self, sigma_min=None, sigma_max=None, chebyshev_n=30, damping=None):
+        """Stochastic Chebyshev estimate of tr(A^{-1}) for SPD A, see trace_fun."""
+        return self.trace_fun("inv", sigma_min=sigma_min, sigma_max=sigma_max, chebyshev_n=chebyshev_n, damping=damping)
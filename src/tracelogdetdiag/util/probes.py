@@ -0,0 +1,116 @@
+import numpy as np
+
+
+
+def get_seed_sequence(seed=None):
+    """Returns a np.random.SeedSequence for seed, which may be None (fresh entropy), an int, a SeedSequence or
+    a np.random.Generator (in which case the SeedSequence of its bit generator is used)."""
+
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    elif isinstance(seed, np.random.Generator):
+        bit_generator = seed.bit_generator
+        return getattr(bit_generator, "seed_seq", None) or bit_generator._seed_seq
+    else:
+        return np.random.SeedSequence(seed)
+
+
+
+def get_rng(seed=None):
+    """Returns a np.random.Generator for seed (see get_seed_sequence). Generators are returned as is."""
+
+    if isinstance(seed, np.random.Generator):
+        return seed
+
+    return np.random.default_rng(get_seed_sequence(seed))
+
+
+
+def spawn_rngs(seed, n):
+    """Returns n statistically independent np.random.Generator streams spawned from seed (None, an int, a
+    SeedSequence or a np.random.Generator, see get_seed_sequence).
+
+    The estimators draw each block of probes from its own stream spawned from their seed argument. Spawning is
+    deterministic given seed, so a seeded estimate is reproducible and does not depend on how the blocks are
+    scheduled, e.g. by map_blocks."""
+
+    return [ np.random.default_rng(child) for child in get_seed_sequence(seed).spawn(n) ]
+
+
+
+def rademacher_probes(n, k, rng=None, dtype=np.float64, xp=np):
+    """Draws an n x k matrix of Rademacher (+-1) probes in the given floating dtype. The signs come from packed
+    random bytes (8 probe entries per byte), so no intermediate integer arrays are formed."""
+
+    rng = get_rng(rng)
+
+    if xp is not np:
+        # Draw on the device, seeded from the host generator
+        device_rng = xp.random.default_rng(int(rng.integers(2**63)))
+        V = (device_rng.random(size=(n, k), dtype=dtype) < 0.5).astype(dtype)
+        V *= -2
+        V += 1
+        return V
+
+    n_entries = n*k
+    random_bytes = np.frombuffer(rng.bytes(int(np.ceil(n_entries/8))), dtype=np.uint8)
+    bits = np.unpackbits(random_bytes, count=n_entries)
+    V = bits.astype(dtype).reshape(n, k)
+    V *= -2
+    V += 1
+
+    return V
+
+
+
+def gaussian_probes(n, k, rng=None, dtype=np.float64, xp=np):
+    """Draws an n x k matrix of standard Gaussian probes in the given floating dtype."""
+
+    rng = get_rng(rng)
+
+    if xp is not np:
+        device_rng = xp.random.default_rng(int(rng.integers(2**63)))
+        return device_rng.standard_normal(size=(n, k), dtype=dtype)
+
+    return rng.standard_normal(size=(n, k), dtype=dtype)
+
+
+
+def draw_probes(n, k, method="rademacher", rng=None, dtype=np.float64, xp=np):
+    """Draws an n x k matrix of probes, with method one of "rademacher" or "standard_gaussian"."""
+
+    valid_methods = ["standard_gaussian", "rademacher"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    if method == "rademacher":
+        return rademacher_probes(n, k, rng=rng, dtype=dtype, xp=xp)
+    elif method == "standard_gaussian":
+        return gaussian_probes(n, k, rng=rng, dtype=dtype, xp=xp)
+    else:
+        raise NotImplementedError
+
+
+
+def seed_sequence_state(seed_seq):
+    """Returns the state of the SeedSequence seed_seq as a dict of plain Python types, e.g. to save the random
+    stream of an estimator so that it can be continued later, see seed_sequence_from_state."""
+
+    entropy = seed_seq.entropy
+    if isinstance(entropy, (list, tuple, np.ndarray)):
+        entropy = [ int(e) for e in entropy ]
+    else:
+        entropy = int(entropy)
+
+    return {
+        "entropy": entropy,
+        "spawn_key": [ int(k) for k in seed_seq.spawn_key ],
+        "n_children_spawned": int(seed_seq.n_children_spawned),
+    }
+
+
+
+def seed_sequence_from_state(state):
+    """Returns the SeedSequence with the given state, see seed_sequence_state. Children spawned from it continue
+    where the saved sequence stopped."""
+
+    return np.random.SeedSequence(state["entropy"], spawn_key=tuple(state["spawn_key"]), n_children_spawned=state["n_children_spawned"])
@@ -0,0 +1,76 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+
+def greedy_coloring(pattern, distance=1):
+    """Greedily colors the graph whose adjacency is given by the sparsity pattern of (I + |pattern|)^distance,
+    so that no two distinct nodes with the same color are adjacent. pattern must be a dense or sparse
+    square matrix; its symmetric part is used. Returns an array of colors 0, ..., n_colors-1.
+    """
+
+    # Build the symmetric adjacency pattern, including the diagonal
+    G = sp.csr_matrix(pattern, dtype=bool)
+    n = G.shape[0]
+    G = (G + G.T + sp.eye(n, dtype=bool, format="csr")).tocsr()
+
+    # Pattern of the distance-th power
+    P = G
+    for _ in range(distance-1):
+        P = (P @ G).tocsr()
+    P.sort_indices()
+
+    # Greedy coloring in natural order
+    colors = -np.ones(n, dtype=int)
+    for i in range(n):
+        nbr_colors = colors[P.indices[P.indptr[i]:P.indptr[i+1]]]
+        nbr_colors = nbr_colors[nbr_colors >= 0]
+        used = np.zeros(len(nbr_colors)+1, dtype=bool)
+        used[nbr_colors[nbr_colors < len(used)]] = True
+        colors[i] = np.argmin(used)
+
+    return colors
+
+
+
+def coloring_probes(colors, start=0, stop=None):
+    """Returns the probing vectors for a coloring, i.e., the n x n_colors matrix V with V[i, c] = 1 if 
+    node i has color c and zero otherwise. Only the columns for colors start, ..., stop-1 are returned.
+    """
+
+    n = len(colors)
+    if stop is None:
+        stop = np.max(colors) + 1
+
+    V = np.zeros((n, stop-start))
+    rows = np.flatnonzero((colors >= start) & (colors < stop))
+    V[rows, colors[rows]-start] = 1.0
+
+    return V
+
+
+
+def hadamard_probes(n, sample_size, start=0):
+    """Returns columns start, ..., start+sample_size-1 of the Sylvester-Hadamard matrix of order 2^ceil(log2(n)),
+    truncated to the first n rows. Entries are computed directly as (-1)^popcount(i & j), so the full
+    Hadamard matrix is never formed. Raises a ValueError if the order has fewer than start+sample_size columns,
+    since further columns would repeat earlier ones restricted to the first n rows.
+    """
+
+    order = 1 << int(np.ceil(np.log2(max(n, 1))))
+    if start + sample_size > order:
+        raise ValueError(f"start + sample_size = {start + sample_size} exceeds the {order} columns of the Hadamard matrix of order {order}.")
+
+    rows = np.arange(n).reshape(-1,1)
+    cols = np.arange(start, start+sample_size).reshape(1,-1)
+    bits = rows & cols
+
+    # Parity of the number of set bits
+    parity = np.zeros(bits.shape, dtype=bits.dtype)
+    while np.any(bits):
+        parity ^= (bits & 1)
+        bits = bits >> 1
+
+    V = 1.0 - 2.0*parity
+
+    return V
@@ -0,0 +1,26 @@
+import numpy as np
+from scipy.linalg import qr as scipy_qr
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+
+
+
+def orthonormal_basis(Y):
+    """Returns an orthonormal basis Q (economic QR) for the range of the block Y, on the device of Y."""
+
+    if CUPY_INSTALLED and not isinstance(Y, np.ndarray):
+        Q, _ = cp.linalg.qr(Y, mode="reduced")
+    else:
+        Q, _ = scipy_qr(Y, mode="economic")
+
+    return Q
+
+
+
+def randomized_range_finder(A, S):
+    """Returns an orthonormal basis Q for the range of A S, i.e., the randomized range approximation of A from
+    the sketch S used by the Hutch++ estimators, see [9]. Costs S.shape[1] matvecs with A."""
+
+    return orthonormal_basis(A @ S)
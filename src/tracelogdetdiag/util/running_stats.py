@@ -0,0 +1,66 @@
+import numpy as np
+
+
+
+class RunningMoments:
+    """Running mean and variance of a stream of samples (scalars or arrays of a fixed shape), updated with 
+    Welford's algorithm. Batches of samples and other RunningMoments are combined with the pairwise update
+    of Chan et al., so the result does not depend on how the samples were split.
+    """
+
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, samples):
+        """Adds a batch of samples, stacked along the first axis."""
+        samples = np.asarray(samples, dtype=float)
+        batch = RunningMoments(shape=self.mean.shape)
+        batch.count = samples.shape[0]
+        if batch.count == 0:
+            return self
+        batch.mean = samples.mean(axis=0)
+        batch.m2 = ((samples - batch.mean)**2).sum(axis=0)
+        return self.merge(batch)
+
+    def merge(self, other):
+        """Merges the moments of other into self."""
+        count = self.count + other.count
+        if count == 0:
+            return self
+        diff = other.mean - self.mean
+        self.mean = self.mean + diff*(other.count/count)
+        self.m2 = self.m2 + other.m2 + (diff**2)*(self.count*other.count/count)
+        self.count = count
+        return self
+
+    def state_dict(self):
+        """Returns the count, mean and m2 as a dict of plain Python types (nested lists for array samples)."""
+        return {
+            "shape": list(self.mean.shape),
+            "count": int(self.count),
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+        }
+
+    @classmethod
+    def from_state_dict(cls, state):
+        """Restores RunningMoments from the output of state_dict."""
+        moments = cls(shape=tuple(state["shape"]))
+        moments.count = state["count"]
+        moments.mean = np.asarray(state["mean"], dtype=float).reshape(moments.mean.shape)
+        moments.m2 = np.asarray(state["m2"], dtype=float).reshape(moments.m2.shape)
+        return moments
+
+    @property
+    def variance(self):
+        """Unbiased sample variance."""
+        if self.count < 2:
+            return np.full(self.mean.shape, np.inf)
+        return self.m2/(self.count - 1)
+
+    @property
+    def standard_error(self):
+        """Standard error of the mean."""
+        return np.sqrt(self.variance/max(self.count, 1))
@@ -0,0 +1,153 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.linalg import eigh_tridiagonal
+from scipy.sparse.linalg import eigs as scipy_eigs
+
+from .cache import IdentityCache
+from .lanczos import batched_lanczos
+from .probes import draw_probes
+
+from .. import CUPY_INSTALLED
+if CUPY_INSTALLED:
+    import cupy as cp
+    from cupyx.scipy.sparse.linalg import LinearOperator as CuPyLinearOperator
+
+
+_SPECTRAL_BOUNDS_CACHE = IdentityCache()
+
+
+
+def lanczos_spectral_bounds(A, lanczos_n=30, margin=0.05, seed=None):
+    """Estimates an interval [lower, upper] containing the spectrum of the SPD matrix A using a short
+    Lanczos run from a random start. The extreme Ritz values are widened by their residual bounds and
+    then by a relative safety margin. If the widened lower bound is not positive, margin*theta_min is
+    used instead (theta_min if margin=0), where theta_min is the smallest Ritz value.
+
+    This is an estimate, not a bound. The upper end is usually reliable, but the smallest Ritz value converges
+    slowly to the smallest eigenvalue of an ill-conditioned A, so lower can be well above it (by orders of
+    magnitude if the bottom of the spectrum is spread out), leaving eigenvalues below the interval.
+    """
+
+    # Handle CuPy
+    if CUPY_INSTALLED:
+        if isinstance(A, CuPyLinearOperator):
+            xp = cp
+        else:
+            xp = np
+    else:
+        xp = np
+
+    # Run Lanczos
+    n = A.shape[0]
+    v = draw_probes(n, 1, method="standard_gaussian", rng=seed, xp=xp)
+    lanczos_data = batched_lanczos(A, v, maxits=min(lanczos_n, n))
+    m = lanczos_data["iterations"][0]
+    alphas = lanczos_data["alphas"][:m,0]
+    betas = lanczos_data["betas"][:m,0]
+
+    # Ritz values and residual bounds
+    thetas, S = eigh_tridiagonal(alphas, betas[:-1])
+    residuals = np.abs(betas[-1]*S[-1,:])
+
+    lower = (thetas[0] - residuals[0])*(1 - margin)
+    if lower <= 0:
+        lower = margin*thetas[0] if margin > 0 else thetas[0]
+    upper = (thetas[-1] + residuals[-1])*(1 + margin)
+
+    return lower, upper
+
+
+
+def gershgorin_spectral_bounds(A):
+    """Computes the Gershgorin interval [lower, upper] containing the spectrum of a symmetric dense or sparse
+    matrix A. The lower bound may be non-positive even if A is SPD.
+    """
+
+    if sp.issparse(A):
+        A = sp.csr_matrix(A)
+        centers = A.diagonal()
+        radii = np.asarray(abs(A).sum(axis=1)).ravel() - np.abs(centers)
+    else:
+        A = np.asarray(A)
+        centers = np.diag(A)
+        radii = np.abs(A).sum(axis=1) - np.abs(centers)
+
+    lower = np.min(centers - radii)
+    upper = np.max(centers + radii)
+
+    return lower, upper
+
+
+
+def spectral_bounds(A, method="lanczos", cache=None, key=None, lanczos_n=30, margin=0.05, seed=None):
+    """Returns an interval [lower, upper] for the spectrum of the SPD matrix A.
+
+    method="gershgorin" uses the Gershgorin interval, which is guaranteed to contain the spectrum but may be
+    wide. method="lanczos" uses the estimate of lanczos_spectral_bounds. When A is an explicit dense or sparse
+    matrix, the upper end is capped by the Gershgorin one, and if the Gershgorin lower end is positive it is used
+    instead of the Lanczos estimate, so that the interval is guaranteed to contain the spectrum. Otherwise the
+    lower end is only an estimate, see lanczos_spectral_bounds, and may lie above the smallest eigenvalue.
+    method="eigs" uses ARPACK (slow, kept for reference). seed seeds the random start of the Lanczos run, so
+    that estimators seeded with seed are reproducible.
+
+    If cache=True, the result is cached per operator identity, key, method, lanczos_n and margin, so repeated calls
+    with the same operator only pay for the estimate once. By default (cache=None) the result is only cached if a
+    key is given. Since the cache cannot see in-place modifications of A, the key should identify the current
+    values of A, e.g. a version counter.
+    """
+
+    valid_methods = ["lanczos", "gershgorin", "eigs"]
+    assert method in valid_methods, f"method must be one of {valid_methods}"
+
+    if cache is None:
+        cache = key is not None
+
+    cache_key = (method, lanczos_n, margin, key)
+    if cache:
+        bounds = _SPECTRAL_BOUNDS_CACHE.get(A, key=cache_key)
+        if bounds is not None:
+            return bounds
+
+    is_explicit = sp.issparse(A) or isinstance(A, np.ndarray)
+
+    if method == "lanczos":
+        lower, upper = lanczos_spectral_bounds(A, lanczos_n=lanczos_n, margin=margin, seed=seed)
+        if is_explicit:
+            g_lower, g_upper = gershgorin_spectral_bounds(A)
+            upper = min(upper, g_upper)
+            if g_lower > 0:
+                lower = g_lower
+    elif method == "gershgorin":
+        assert is_explicit, "gershgorin bounds need an explicit dense or sparse matrix."
+        lower, upper = gershgorin_spectral_bounds(A)
+        assert lower > 0, "Gershgorin lower bound is not positive, use another method."
+    elif method == "eigs":
+        upper, _ = scipy_eigs(A, k=1, which="LM")
+        lower, _ = scipy_eigs(A, k=1, which="SM")
+        upper, lower = np.real(upper[0]), np.real(lower[0])
+    else:
+        raise NotImplementedError
+
+    bounds = (float(lower), float(upper))
+    if cache:
+        _SPECTRAL_BOUNDS_CACHE.set(A, bounds, key=cache_key)
+
+    return bounds
+
+
+
+def widen_spectral_bounds(lower, upper, margin=0.05):
+    """Returns [lower, upper] widened by the relative margin if it is (numerically) a single point, e.g. the
+    Gershgorin interval of a multiple of the identity. Chebyshev expansions map [lower, upper] to [-1,1] and
+    need upper > lower."""
+
+    if upper - lower <= 1e-12*abs(upper):
+        lower, upper = (1 - margin)*lower, (1 + margin)*upper
+
+    return lower, upper
+
+
+
+def clear_spectral_bounds_cache():
+    """Clears the cache used by spectral_bounds."""
+    _SPECTRAL_BOUNDS_CACHE.clear()
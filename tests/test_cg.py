@@ -0,0 +1,51 @@
+import numpy as np
+
+from tracelogdetdiag.util import relative_resigual_cg, batched_relative_residual_cg, ritz_deflation_space, AinvCGLinearOperator
+
+
+
+def _spd_matrix_with_small_eigenvalues(n=200, k=4, seed=0):
+    rng = np.random.default_rng(seed)
+    V, _ = np.linalg.qr(rng.standard_normal((n, n)))
+    eigvals = np.concatenate([np.logspace(-4, -2, k), np.linspace(1, 10, n-k)])
+    return (V*eigvals) @ V.T, V[:,:k], eigvals
+
+
+
+def test_deflated_cg_solves():
+    A, W, _ = _spd_matrix_with_small_eigenvalues()
+    rng = np.random.default_rng(1)
+    b = rng.standard_normal(A.shape[0])
+    B = rng.standard_normal((A.shape[0], 3))
+
+    plain = relative_resigual_cg(A, b, eps=1e-10)
+    deflated = relative_resigual_cg(A, b, eps=1e-10, W=W, AW=A @ W)
+    assert deflated["converged"]
+    assert np.allclose(deflated["x"], np.linalg.solve(A, b), rtol=1e-6)
+    assert deflated["iterations"] < plain["iterations"]
+
+    batched = batched_relative_residual_cg(A, B, eps=1e-10, W=W, AW=A @ W)
+    assert np.all(batched["converged"])
+    assert np.allclose(batched["x"], np.linalg.solve(A, B), rtol=1e-6)
+
+
+
+def test_ritz_deflation_space():
+    A, W, eigvals = _spd_matrix_with_small_eigenvalues()
+    X = np.concatenate([W, np.random.default_rng(2).standard_normal((A.shape[0], 2))], axis=1)
+    U, AU, thetas, residual_norms = ritz_deflation_space(A, X, 4)
+    assert np.allclose(thetas, eigvals[:4])
+    assert np.allclose(AU, A @ U)
+    assert np.all(residual_norms < 1e-8)
+
+
+
+def test_recycled_cg_operator():
+    A, _, _ = _spd_matrix_with_small_eigenvalues()
+    Ainv = AinvCGLinearOperator(A, cg_tol=1e-10, use_prev=False, recycle_k=4)
+    rng = np.random.default_rng(3)
+    for _ in range(4):
+        B = rng.standard_normal((A.shape[0], 5))
+        assert np.allclose(Ainv @ B, np.linalg.solve(A, B), rtol=1e-6)
+    assert Ainv.U.shape[1] == 4
+    assert max(Ainv.iterations[-5:]) < min(Ainv.iterations[:5])
@@ -0,0 +1,34 @@
+import numpy as np
+
+from tracelogdetdiag.logdet import evaluate_ith_chebyshev_polynomial, get_chebyshev_coeffs, get_interval_chebyshev_coeffs, get_logdet_chebyshev_coeffs, logdet_stochastic_chebyshev_approx, trace_fun_stochastic_chebyshev_approx
+
+
+
+def test_logdet_chebyshev_coeffs():
+    delta, n = 0.05, 40
+    coeffs = get_logdet_chebyshev_coeffs(delta, n)
+    xs = np.linspace(-1, 1, 11)
+    approx = sum(coeffs[i]*evaluate_ith_chebyshev_polynomial(xs, i) for i in range(n+1))
+    assert np.allclose(approx, np.log(1 - ((1-2*delta)/2)*xs - 0.5))
+
+
+
+def test_chebyshev_coeffs_of_closures():
+    coeffs = []
+    for p in (1, 2, 3):
+        f = lambda x: x**p
+        coeffs.append(get_interval_chebyshev_coeffs(f, 1.0, 10.0, 8))
+    assert np.allclose([c[0] for c in coeffs], [5.5, 40.375, 333.4375])
+    assert np.allclose(get_chebyshev_coeffs(lambda x: x**2, 4), [0.5, 0, 0.5, 0, 0])
+
+
+
+def test_logdet_stochastic_chebyshev_diagonal():
+    # Rademacher probes give v^T f(D) v = tr(f(D)) for diagonal D, so only the expansion error remains
+    eigvals = np.geomspace(0.5, 20, 100)
+    D = np.diag(eigvals)
+    estimate = logdet_stochastic_chebyshev_approx(D, sigma_min=0.5, sigma_max=20, sample_size=10, chebyshev_n=60, seed=0)
+    assert np.isclose(estimate, np.sum(np.log(eigvals)), rtol=1e-6)
+
+    estimates = trace_fun_stochastic_chebyshev_approx(D, ["log", "inv"], sigma_min=0.5, sigma_max=20, sample_size=10, chebyshev_n=60, seed=0)
+    assert np.allclose(estimates, [np.sum(np.log(eigvals)), np.sum(1/eigvals)], rtol=1e-6)
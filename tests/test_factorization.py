@@ -0,0 +1,43 @@
+import numpy as np
+
+from tracelogdetdiag.logdet import logdet_via_cholesky
+from tracelogdetdiag.diaginv import explicit_diaginv_probe
+from tracelogdetdiag.util import factorize, clear_factorization_cache
+
+
+
+def _spd_matrix(n=50, seed=0):
+    B = np.random.default_rng(seed).standard_normal((n, n))
+    return B @ B.T + n*np.eye(n)
+
+
+
+def test_exact_estimators_see_in_place_updates():
+    clear_factorization_cache()
+    A = _spd_matrix()
+    logdet_via_cholesky(A)
+    explicit_diaginv_probe(A)
+
+    A *= 2
+    assert np.isclose(logdet_via_cholesky(A), np.linalg.slogdet(A)[1])
+    assert np.allclose(explicit_diaginv_probe(A), np.diag(np.linalg.inv(A)))
+
+
+
+def test_factorization_cache_key():
+    clear_factorization_cache()
+    A = _spd_matrix()
+    assert factorize(A) is not factorize(A)
+    assert factorize(A, key=0) is factorize(A, key=0)
+    assert factorize(A, key=0) is not factorize(A, key=1)
+
+
+
+def test_factorization_cache_bandwidth():
+    clear_factorization_cache()
+    n = 20
+    B = np.diag(4*np.ones(n)) + np.diag(np.ones(n-1), 1) + np.diag(np.ones(n-1), -1)
+    f1 = factorize(B, "banded_cholesky", bandwidth=1, key=0)
+    f3 = factorize(B, "banded_cholesky", bandwidth=3, key=0)
+    assert f1 is not f3
+    assert f3.factor.shape[0] == 4
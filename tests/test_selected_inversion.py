@@ -0,0 +1,40 @@
+import numpy as np
+import scipy.sparse as sp
+
+from tracelogdetdiag.diaginv import diaginv_via_selected_inversion
+from tracelogdetdiag.util import factorize
+
+
+
+def _banded_spd_matrix(n=60, bandwidth=3, seed=0):
+    rng = np.random.default_rng(seed)
+    A = np.zeros((n, n))
+    for k in range(1, bandwidth+1):
+        offdiag = rng.uniform(-1, 1, n-k)
+        A += np.diag(offdiag, k) + np.diag(offdiag, -k)
+    A += (2*bandwidth + 1)*np.eye(n)
+    return A
+
+
+
+def test_banded_selected_inversion():
+    A = _banded_spd_matrix()
+    exact = np.diag(np.linalg.inv(A))
+    assert np.allclose(diaginv_via_selected_inversion(A, method="banded_cholesky"), exact)
+    assert np.allclose(diaginv_via_selected_inversion(A, method="banded_cholesky", bandwidth=5), exact)
+
+
+
+def test_sparse_selected_inversion():
+    n = 80
+    B = sp.random(n, n, density=0.05, random_state=0, format="csr")
+    A = sp.csc_matrix(B @ B.T + n*sp.eye(n))
+    exact = np.diag(np.linalg.inv(A.toarray()))
+    assert np.allclose(diaginv_via_selected_inversion(A, method="sparse_cholesky"), exact)
+
+
+
+def test_selected_inversion_matches_factorization():
+    A = _banded_spd_matrix(n=30, bandwidth=1)
+    factorization = factorize(A, method="banded_cholesky")
+    assert np.allclose(diaginv_via_selected_inversion(A, factorization=factorization), np.diag(np.linalg.inv(A)))
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+
+from tracelogdetdiag.trace import HutchinsonTraceEstimator
+from tracelogdetdiag.diag import DiagEstimator
+from tracelogdetdiag.util import RunningMoments
+
+
+
+def _spd_matrix(n=40, seed=0):
+    B = np.random.default_rng(seed).standard_normal((n, n))
+    return B @ B.T + np.eye(n)
+
+
+
+def test_running_moments_merge():
+    samples = np.random.default_rng(0).standard_normal(101)
+    moments = RunningMoments().update(samples[:37]).merge(RunningMoments().update(samples[37:]))
+    assert moments.count == 101
+    assert np.isclose(moments.mean, np.mean(samples))
+    assert np.isclose(moments.variance, np.var(samples, ddof=1))
+
+
+
+def test_trace_estimator_merge():
+    A = _spd_matrix()
+    seeds = np.random.default_rng(1).bit_generator.seed_seq.spawn(2)
+    e1 = HutchinsonTraceEstimator(A, seed=seeds[0]).update(60)
+    e2 = HutchinsonTraceEstimator(A, seed=seeds[1]).update(40)
+    expected = (60*e1.result()["estimate"] + 40*e2.result()["estimate"])/100
+
+    merged = e1.merge(e2).result()
+    assert merged["sample_size"] == 100
+    assert np.isclose(merged["estimate"], expected)
+
+
+
+def test_estimator_state_dict_round_trip():
+    A = _spd_matrix()
+    for cls in (HutchinsonTraceEstimator, DiagEstimator):
+        uninterrupted = cls(A, seed=2).update(60)
+        restored = cls.from_state_dict(A, json.loads(json.dumps(cls(A, seed=2).update(40).state_dict()))).update(20)
+        if cls is DiagEstimator:
+            assert np.allclose(restored.result(), uninterrupted.result())
+        else:
+            assert np.isclose(restored.result()["estimate"], uninterrupted.result()["estimate"])
+
+
+
+def test_diag_estimator_merge():
+    # Rademacher probes recover the diagonal of a diagonal matrix exactly
+    d = np.linspace(1, 5, 30)
+    e1 = DiagEstimator(np.diag(d), seed=3).update(7)
+    e2 = DiagEstimator(np.diag(d), seed=4).update(5)
+    merged = e1.merge(e2)
+    assert merged.sample_size == 12
+    assert np.allclose(merged.result(), d)
+    assert np.allclose(merged.qk, 12)